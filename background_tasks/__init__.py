@@ -1,7 +1,19 @@
-from .apod import AstronomyPictureOfTheDayTask
-from .bm_players import BattlemetricsPlayersTask
-from .chat import DeleteChatConversations
-from .f1 import F1DaySchedule, F1RaceWeek, F1Results
-from .hacker_news import HackerNewsTask
-from .new_movies import YtsNewMoviesTask
-from .squad import SquadLayersTask
+from utils.lazy import lazy_exports
+
+# The background tasks by class name, and their modules. The modules are
+# imported when the task is first used, see `Registry`
+HANDLERS = {
+    'AstronomyPictureOfTheDayTask': '.apod',
+    'BattlemetricsPlayersTask': '.bm_players',
+    'DeleteChatConversations': '.chat',
+    'F1DaySchedule': '.f1',
+    'F1RaceWeek': '.f1',
+    'F1Results': '.f1',
+    'HackerNewsTask': '.hacker_news',
+    'SquadLayersTask': '.squad',
+    'YtsNewMoviesTask': '.new_movies',
+}
+# Only started when they're in ENABLED_HANDLERS
+DISABLED_BY_DEFAULT = {'HackerNewsTask'}
+
+__getattr__, __dir__ = lazy_exports(__name__, HANDLERS)
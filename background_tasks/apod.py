@@ -4,14 +4,14 @@ import datetime
 import logging
 import re
 
-from aiohttp_requests import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
-
 import config
 from background_tasks.base import CrontabDiscordTask
-from utils import redis
+from utils import http, redis
 from utils.images import upload_image
+from utils.lazy import lazy_import
+
+bs4 = lazy_import('bs4')
+markdownify = lazy_import('markdownify')
 
 APOD_URL = 'https://apod.nasa.gov/apod/'
 MD_LINK_RE = re.compile(r'\]\(([^) ]+)\)')
@@ -38,17 +38,17 @@ class AstronomyPictureOfTheDayTask(CrontabDiscordTask):
     async def work(self):
         try:
             data = await self.get_data()
-            await requests.session.post(config.DISCORD_APOC_WEBHOOK_URL, json=data)
+            await http.get_session('discord').post(config.DISCORD_APOC_WEBHOOK_URL, json=data)
         except Exception:
             logger.exception('Error sending APOD')
         else:
             logger.info('Sent APOD')
 
     async def get_data(self):
-        response = await requests.session.get(APOD_URL)
+        response = await http.get_session().get(APOD_URL)
         response.raise_for_status()
         html = await response.text()
-        soup = BeautifulSoup(html, features='lxml')
+        soup = bs4.BeautifulSoup(html, features='lxml')
 
         img_src = f"{APOD_URL}{soup.find('img').parent['href']}"
         img_src = await upload_image(img_src)
@@ -92,7 +92,7 @@ class AstronomyPictureOfTheDayTask(CrontabDiscordTask):
 
 def html_to_markdown(html: str) -> str:
     result = html.replace('\n', ' ')
-    result = md(result).strip()
+    result = markdownify.markdownify(result).strip()
     return result
 
 
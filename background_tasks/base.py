@@ -1,11 +1,17 @@
+from __future__ import annotations
+
 import asyncio
+import datetime
 import logging
 import random
+import time
 from abc import ABC, abstractmethod
-from typing import Tuple, Union
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Union
 
-import aiocron
 import pytz
+from croniter import croniter
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +19,13 @@ logger = logging.getLogger(__name__)
 class DiscordTask(ABC):
     """Abstract class for background tasks that should run once."""
 
+    # Registration, see `commands.base.Registry`
+    name = None
+    priority = 0
+    variants = None
+
+    raise_errors = False
+
     def __init__(self, client):
         self.client = client
 
@@ -26,62 +39,38 @@ class DiscordTask(ABC):
 
 
 class CrontabDiscordTask(DiscordTask, ABC):
-    """Abstract class for crontab background tasks."""
+    """
+    Abstract class for crontab background tasks.
+
+    Runs start up to `jitter_seconds` after their scheduled time, so that
+    the tasks with the same schedule don't all start in the same second.
+    At most `max_concurrency` runs are running at the same time, ticks that
+    come while they're running are skipped.
+
+    Runs that start more than `misfire_grace_seconds` late, e.g. because the
+    event loop was blocked, run once for all the missed ticks, or are
+    skipped if `run_missed` isn't set.
+    """
 
     crontab = '* * * * *'
     run_on_start = False
-    raise_errors = False
     timezone = 'Europe/Zurich'
-
-    def __init__(self, client):
-        super().__init__(client)
-        self.cron = aiocron.crontab(
-            self.crontab,
-            func=self.work_wrapper,
-            start=False,
-            tz=pytz.timezone(self.timezone),
-        )
-
-    async def start(self):
-        await self.client.wait_until_ready()
-
-        if self.run_on_start:
-            await self.work_wrapper()
-
-        while True:
-            await self.cron.next()
-
-    async def work_wrapper(self):
-        try:
-            await self.work()
-        except Exception:
-            if self.raise_errors:
-                raise
-            else:
-                logger.exception('Unexpected exception in crontab discord task')
+    jitter_seconds = 0
+    max_concurrency = 1
+    misfire_grace_seconds = 60
+    run_missed = True
 
 
 class SleepDiscordTask(DiscordTask, ABC):
-    """Abstract class for sleep background tasks."""
+    """
+    Abstract class for sleep background tasks. After a failed run they sleep
+    `error_sleep_seconds` instead, if it's set.
+    """
 
     sleep_seconds: Union[int, Tuple[int, int]]
-    raise_errors = False
-
-    def __init__(self, client):
-        super().__init__(client)
-
-    async def start(self):
-        await self.client.wait_until_ready()
+    error_sleep_seconds: Optional[int] = None
 
-        while True:
-            try:
-                await self.work_wrapper()
-            except:
-                logger.exception('Unknown exception')
-            sleep_seconds = self._calculate_sleep_seconds()
-            await asyncio.sleep(sleep_seconds)
-
-    def _calculate_sleep_seconds(self) -> int:
+    def calculate_sleep_seconds(self) -> int:
         if isinstance(self.sleep_seconds, int):
             return self.sleep_seconds
         elif isinstance(self.sleep_seconds, tuple):
@@ -93,11 +82,163 @@ class SleepDiscordTask(DiscordTask, ABC):
                 self.sleep_seconds,
             )
 
-    async def work_wrapper(self):
+
+@dataclass
+class TaskStats:
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0  # Ticks skipped because the previous runs were still running
+    missed: int = 0  # Ticks missed because the loop was late
+    running: int = 0
+    last_run: Optional[datetime.datetime] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    durations: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def p95_duration(self) -> Optional[float]:
+        if not self.durations:
+            return None
+        durations = sorted(self.durations)
+        return durations[min(int(len(durations) * 0.95), len(durations) - 1)]
+
+    def as_dict(self) -> dict:
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'missed': self.missed,
+            'running': self.running,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration,
+            'p95_duration': self.p95_duration,
+            'last_error': self.last_error,
+        }
+
+
+class Scheduler:
+    """
+    Runs the background tasks of the bot once the client is ready.
+
+    Crontab tasks run on their schedule, see `CrontabDiscordTask`, sleep
+    tasks sleep between the end of a run and the start of the next one, and
+    other tasks run once. The runs of each task are counted and timed in
+    `stats`, the durations of the last 100 runs are kept for the p95.
+
+    A run is a single call of `work()`, which should do a bounded amount of
+    work and return. Tasks that wait for something return how long to wait
+    from `calculate_sleep_seconds()` instead of sleeping in `work()`, so
+    that the waits aren't timed as runs. A crontab run that lasts longer
+    than the interval to the next tick is logged.
+
+    A task with `raise_errors` stops being scheduled after its first error.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.tasks: dict[str, DiscordTask] = {}
+        self.stats: dict[str, TaskStats] = {}
+        self._schedules: dict[str, asyncio.Task] = {}
+        self._runs: set[asyncio.Task] = set()
+
+    def add(self, task: DiscordTask) -> None:
+        name = task.name or type(task).__name__
+        self.tasks[name] = task
+        self.stats[name] = TaskStats()
+        self._schedules[name] = self.client.loop.create_task(self._schedule(name, task))
+
+    def get_stats(self) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    async def _schedule(self, name: str, task: DiscordTask) -> None:
+        await self.client.wait_until_ready()
         try:
-            await self.work()
+            if isinstance(task, CrontabDiscordTask):
+                await self._schedule_crontab(name, task)
+            elif isinstance(task, SleepDiscordTask):
+                await self._schedule_sleep(name, task)
+            else:
+                await self._run(name, task)
         except Exception:
-            if self.raise_errors:
-                raise
+            logger.exception('Stopped scheduling the %s task', name)
+
+    async def _schedule_crontab(self, name: str, task: CrontabDiscordTask) -> None:
+        stats = self.stats[name]
+        if task.run_on_start:
+            await self._run(name, task)
+
+        tz = pytz.timezone(task.timezone)
+        schedule = croniter(task.crontab, datetime.datetime.now(tz))
+        next_time = schedule.get_next(float)
+        while True:
+            jitter = random.uniform(0, task.jitter_seconds) if task.jitter_seconds else 0
+            await asyncio.sleep(max(next_time + jitter - time.time(), 0))
+
+            # Ticks that passed while sleeping are merged into this run
+            now = time.time()
+            delay = now - next_time - jitter
+            missed = 0
+            following = schedule.get_next(float)
+            while following <= now:
+                missed += 1
+                following = schedule.get_next(float)
+            interval = following - now
+            next_time = following
+            if delay > task.misfire_grace_seconds:
+                logger.warning('The %s task is %.0fs late', name, delay)
+                if not task.run_missed:
+                    # This tick is missed too
+                    stats.missed += missed + 1
+                    continue
+            stats.missed += missed
+
+            if stats.running >= task.max_concurrency:
+                stats.skipped += 1
+                logger.warning('Skipping the %s task, the previous run is still running', name)
+                continue
+            run = asyncio.create_task(self._run(name, task, interval))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+            if task.raise_errors:
+                # Wait for the run, so that its error stops the schedule
+                await run
+
+    async def _schedule_sleep(self, name: str, task: SleepDiscordTask) -> None:
+        while True:
+            if not await self._run(name, task) and task.error_sleep_seconds is not None:
+                await asyncio.sleep(task.error_sleep_seconds)
             else:
-                logger.exception('Unexpected exception in crontab discord task')
+                await asyncio.sleep(task.calculate_sleep_seconds())
+
+    async def _run(self, name: str, task: DiscordTask, interval: Optional[float] = None) -> bool:
+        """Run the task once and return whether it succeeded."""
+        stats = self.stats[name]
+        stats.running += 1
+        stats.last_run = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        try:
+            if isinstance(task, (CrontabDiscordTask, SleepDiscordTask)):
+                await task.work()
+            else:
+                await task.start()
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = repr(e)
+            if task.raise_errors:
+                raise
+            logger.exception('Unexpected exception in the %s task', name)
+            return False
+        finally:
+            duration = time.perf_counter() - start
+            stats.running -= 1
+            stats.runs += 1
+            stats.last_duration = duration
+            stats.durations.append(duration)
+            if interval is not None and duration > interval:
+                logger.warning(
+                    'The %s task ran for %.0fs, past its next tick in %.0fs',
+                    name,
+                    duration,
+                    interval,
+                )
+        return True
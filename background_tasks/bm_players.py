@@ -1,94 +1,185 @@
+from __future__ import annotations
+
+import dataclasses
 import logging
+from dataclasses import dataclass, field
+from typing import Optional
 
-import a2s
 import discord
 
 import commands
 import config
 from background_tasks import squad
 from background_tasks.base import CrontabDiscordTask
-from utils import battlemetrics
+from utils import battlemetrics, player_sessions, redis
+from utils.battlemetrics import PlayerSnapshot, ServerSnapshot
 
 logger = logging.getLogger(__name__)
 
-players_data = {}
-servers_data = []
+players_data: dict[str, Optional[PlayerSnapshot]] = {}
+servers_data: list[ServerSnapshot] = []
+
+# Server fields shown in the who messages
+SERVER_DISPLAY_FIELDS = ('name', 'layer', 'next_layer', 'players', 'max_players', 'queue')
+
+
+@dataclass
+class SnapshotDiff:
+    """Changes between two polls of the players and their servers."""
+
+    joined: set[str] = field(default_factory=set)
+    left: set[str] = field(default_factory=set)
+    changed_servers: set[str] = field(default_factory=set)  # Server ids
+    layer_changes: dict[str, tuple] = field(default_factory=dict)  # Id: (old layer, new layer)
+    games: set[str] = field(default_factory=set)  # Games whose who messages changed
+
+    def __bool__(self) -> bool:
+        return bool(self.games)
+
+
+def diff_snapshots(
+    old_servers: list[ServerSnapshot], new_servers: list[ServerSnapshot]
+) -> SnapshotDiff:
+    diff = SnapshotDiff()
+    old = {server.id: server for server in old_servers}
+    new = {server.id: server for server in new_servers}
+
+    old_players = {name: id_ for id_, server in old.items() for name in server.pepegas}
+    new_players = {name: id_ for id_, server in new.items() for name in server.pepegas}
+    diff.joined = {name for name, id_ in new_players.items() if old_players.get(name) != id_}
+    diff.left = {name for name, id_ in old_players.items() if new_players.get(name) != id_}
+
+    for server_id in old.keys() | new.keys():
+        old_server, new_server = old.get(server_id), new.get(server_id)
+        if old_server and new_server:
+            if old_server.layer != new_server.layer:
+                diff.layer_changes[server_id] = (old_server.layer, new_server.layer)
+            if old_server.pepegas == new_server.pepegas and all(
+                getattr(old_server, key) == getattr(new_server, key)
+                for key in SERVER_DISPLAY_FIELDS
+            ):
+                continue
+        diff.changed_servers.add(server_id)
+        diff.games.add((new_server or old_server).game)
+
+    # The order of the servers changes with their number of players
+    if [server.id for server in old_servers] != [server.id for server in new_servers]:
+        diff.games |= {server.game for server in old_servers + new_servers}
+
+    return diff
 
 
 class BattlemetricsPlayersTask(CrontabDiscordTask):
     """
     Task that checks what players are online and on which servers.
+
+    Each poll is compared with the previous one, and only the who messages
+    of the games that changed are edited. The bot presence is only updated
+    when the number of pepegas changes, and it's retried on the next poll
+    if the gateway isn't connected.
+
+    With `BM_A2S`, it polls every 2 seconds, see `PlayerTracker` for how
+    the A2S and BattleMetrics polls are combined.
+
+    The sessions of the players are recorded for `!stats`, see
+    `SessionRecorder`.
     """
 
-    crontab = '* * * * * */20'
+    crontab = '* * * * * */2' if config.BM_A2S else '* * * * * */20'
     run_on_start = True
 
     def __init__(self, client):
         super().__init__(client)
+        self.presence_pepegas = None
+        self.tracker = battlemetrics.PlayerTracker(
+            config.BM_SERVERS,
+            config.BM_PLAYERS,
+            config.BM_TOKEN,
+            concurrency=config.BM_CONCURRENCY,
+            a2s_timeout=config.BM_A2S_TIMEOUT if config.BM_A2S else None,
+        )
+        self.sessions = player_sessions.SessionRecorder(redis.get_client())
 
     async def work(self):
         await self.update_players_data()
-        await self.update_server_data()
-        await self.update_who_messages()
+        diff = self.update_server_data()
+        if diff.joined or diff.left or diff.layer_changes:
+            logger.info(
+                'Pepegas joined: %s, left: %s, layer changes: %s',
+                diff.joined,
+                diff.left,
+                diff.layer_changes,
+            )
+        if diff:
+            await self.update_who_messages(diff.games)
         await self.update_bot_presence()
+        await self.record_sessions()
 
-    @staticmethod
-    async def update_players_data() -> None:
-        players = await battlemetrics.get_server_players('2272069', config.BM_TOKEN)
+    async def update_players_data(self) -> None:
+        players = await self.tracker.get_players()
         for player_id, player_name in config.BM_PLAYERS.items():
             players_data[player_name] = players.get(player_id)
 
-    async def update_server_data(self) -> None:
-        servers = {}
-        for player_name, player_data in players_data.items():
-            if not player_data:
+    def update_server_data(self) -> SnapshotDiff:
+        servers: dict[str, ServerSnapshot] = {}
+        pepegas: dict[str, list[str]] = {}
+        for player_name, player in players_data.items():
+            if not player or not player.server or not player.server.name:
                 continue
-
-            server = player_data['server']
-            server_name = server['name']
-
-            if not server_name:
-                continue
-
-            if server_name not in servers:
-                servers[server_name] = server
-                servers[server_name]['pepegas'] = []
-
-            servers[server_name]['pepegas'].append(player_name)
-
-        for server in servers.values():
-            server['pepegas'].sort(key=lambda name: name.lower())
-            server['next_layer_data'] = squad.layers_data.get(server['next_layer'])
+            servers.setdefault(player.server.id, player.server)
+            pepegas.setdefault(player.server.id, []).append(player_name)
 
         global servers_data
         was_empty = not servers_data
-        servers_data = list(servers.values())
-        servers_data.sort(key=lambda server_: len(server_['pepegas']), reverse=True)
+        new_servers_data = [
+            dataclasses.replace(
+                server,
+                pepegas=tuple(sorted(pepegas[server_id], key=lambda name: name.lower())),
+                next_layer_data=squad.layers_data.get(server.next_layer),
+            )
+            for server_id, server in servers.items()
+        ]
+        new_servers_data.sort(key=lambda server_: len(server_.pepegas), reverse=True)
+        diff = diff_snapshots(servers_data, new_servers_data)
+        servers_data = new_servers_data
         is_empty = not servers_data
         # This is commented out to disable the degen messages
         # if was_empty and not is_empty:
         #     await commands.WhoCommand(self.client).send_degen_message()
         # if is_empty and not was_empty:
         #     await commands.WhoCommand(self.client).delete_degen_messages()
+        return diff
+
+    async def update_who_messages(self, games: set[str]) -> None:
+        for who_command in self.client.registry.get(commands.WhoCommand):
+            if who_command.game in games:
+                await who_command.update_messages()
 
-    async def update_who_messages(self) -> None:
-        await self.client.squad_who_command.update_messages()
-        await self.client.ps_who_command.update_messages()
+    async def record_sessions(self) -> None:
+        try:
+            await self.sessions.record(servers_data)
+        except Exception:
+            # The sessions are closed when the polls are too far apart
+            logger.exception('Error recording the player sessions')
 
     async def update_bot_presence(self) -> None:
-        # Count how many pepegas are playing
-        pepegas = 0
-        for pepega in players_data.values():
-            if not pepega:
-                continue
-            if pepega['server']['id']:
-                pepegas += 1
+        pepegas = sum(len(server.pepegas) for server in servers_data)
+        if pepegas == self.presence_pepegas:
+            return
+
+        if self.client.ws is None or not self.client.is_ready():
+            # Reconnecting, the presence is updated on the next poll
+            return
 
-        # Update bot presence
         plural = 's' if pepegas != 1 else ''
-        await self.client.change_presence(
-            activity=discord.Activity(
-                name=f'with {pepegas} pepega{plural}',
-                type=discord.ActivityType.playing,
+        try:
+            await self.client.change_presence(
+                activity=discord.Activity(
+                    name=f'with {pepegas} pepega{plural}',
+                    type=discord.ActivityType.playing,
+                )
             )
-        )
+        except (discord.ConnectionClosed, ConnectionError):
+            logger.warning('Gateway not connected, presence will be updated on the next poll')
+            return
+        self.presence_pepegas = pepegas
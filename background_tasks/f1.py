@@ -1,24 +1,22 @@
 from __future__ import annotations
 
 import datetime
-import json
 import logging
-from dataclasses import dataclass
 from typing import Optional, Union
 
-import dateutil.parser
-import fastf1.core
-import pandas as pd
-from aiohttp_requests import requests
-
 import config
-from background_tasks.base import CrontabDiscordTask
+from background_tasks.base import CrontabDiscordTask, SleepDiscordTask
 from utils import f1, redis
-from utils.datetime import is_today, to_epoch, utc_now
+from utils.datetime import utc_now
+from utils.executors import run_io
+from utils.f1 import Race, Session
+from utils.lazy import lazy_import
 
-REDIS_KEY = 'f1_last_handled_session'
+fastf1 = lazy_import('fastf1')
+fastf1_api = lazy_import('fastf1._api')  # Same as fastf1.api, without its import warning
+pd = lazy_import('pandas')
 
-SCHEDULE_URL = 'https://raw.githubusercontent.com/sportstimes/f1/main/_db/f1/{}.json'
+REDIS_KEY = 'f1_last_handled_session'
 
 SESSIONS_MAPPING = {
     'fp1': 'FP1',
@@ -46,31 +44,15 @@ TEAM_EMOTES = {
 }
 BLANK_TEAM_EMOTE = '<:a:1127684877811195975>'
 
-logger = logging.getLogger(__name__)
-
-
-@dataclass
-class Session:
-    type_: str
-    timestamp: datetime.datetime
-
-    @property
-    def week(self) -> int:
-        return self.timestamp.isocalendar()[1]
-
-    @property
-    def iso_timestamp(self) -> int:
-        return to_epoch(self.timestamp)
-
-
-@dataclass
-class Race:
-    name: str
-    sessions: list[Session]
+# Expected duration of the sessions from the schedule that have results
+RESULTS_SESSIONS = {
+    'sprintQualifying': datetime.timedelta(minutes=45),
+    'sprint': datetime.timedelta(hours=1),
+    'qualifying': datetime.timedelta(hours=1),
+    'gp': datetime.timedelta(hours=2),
+}
 
-    @property
-    def week(self) -> int:
-        return self.sessions[0].week
+logger = logging.getLogger(__name__)
 
 
 class F1RaceWeek(CrontabDiscordTask):
@@ -99,32 +81,10 @@ class F1RaceWeek(CrontabDiscordTask):
         message = await self.channel.send(content=msg)
         await message.pin()
 
-    async def get_current_race(self) -> Optional[Race]:
-        current_week = datetime.date.today().isocalendar()[1]
-        for race in await self.load_races():
-            if race.week == current_week:
-                return race
-
-    async def load_races(self) -> list[Race]:
-        url = SCHEDULE_URL.format(utc_now().year)
-        res = await requests.session.get(url)
-        data = json.loads(await res.text())
-        races = [self.parse_race(race) for race in data['races']]
-        return races
-
-    def parse_race(self, race_dict: dict) -> Race:
-        sessions = [self.parse_session(*session) for session in race_dict['sessions'].items()]
-        return Race(
-            name=race_dict['name'],
-            sessions=sessions,
-        )
-
     @staticmethod
-    def parse_session(session_type: str, timestamp: str) -> Session:
-        return Session(
-            type_=session_type,
-            timestamp=dateutil.parser.parse(timestamp),
-        )
+    async def get_current_race() -> Optional[Race]:
+        season = await f1.schedule.get_season()
+        return season.get_week_race(datetime.date.today())
 
     @staticmethod
     def build_message(race: Race) -> str:
@@ -169,39 +129,10 @@ class F1DaySchedule(CrontabDiscordTask):
         msg = self.build_message(race, sessions)
         await self.channel.send(content=msg)
 
-    async def get_today_sessions(self):
-        race = await self.get_current_race()
-        if not race:
-            return None, None
-        sessions = [session for session in race.sessions if is_today(session.timestamp)]
-        return race, sessions
-
-    async def get_current_race(self) -> Optional[Race]:
-        current_week = datetime.date.today().isocalendar()[1]
-        for race in await self.load_races():
-            if race.week == current_week:
-                return race
-
-    async def load_races(self) -> list[Race]:
-        url = SCHEDULE_URL.format(utc_now().year)
-        res = await requests.session.get(url)
-        data = json.loads(await res.text())
-        races = [self.parse_race(race) for race in data['races']]
-        return races
-
-    def parse_race(self, race_dict: dict) -> Race:
-        sessions = [self.parse_session(*session) for session in race_dict['sessions'].items()]
-        return Race(
-            name=race_dict['name'],
-            sessions=sessions,
-        )
-
     @staticmethod
-    def parse_session(session_type: str, timestamp: str) -> Session:
-        return Session(
-            type_=session_type,
-            timestamp=dateutil.parser.parse(timestamp),
-        )
+    async def get_today_sessions() -> tuple[Optional[Race], list[Session]]:
+        season = await f1.schedule.get_season()
+        return season.get_day_sessions(utc_now().date())
 
     @staticmethod
     def build_message(race: Race, sessions: list[Session]) -> str:
@@ -220,20 +151,35 @@ class F1DaySchedule(CrontabDiscordTask):
         return '\n'.join(lines)
 
 
-class F1Results(CrontabDiscordTask):
+class F1Results(SleepDiscordTask):
     """
     Task that post session results when they become available.
+
+    The task waits until the expected end of the next session in the
+    schedule, and then polls the session status with an increasing interval
+    until the results are posted or RESULTS_WINDOW has passed. Each run is a
+    single poll, and sets how long to wait before the next one.
     """
 
     ALLOWED_SESSIONS = {'sprint shootout', 'sprint', 'qualifying', 'race'}
+    # FastF1 builds the results of these from the laps until Ergast has them
+    QUALI_SESSIONS = {'sprint shootout', 'qualifying'}
 
-    crontab = '* * * * * 0'
-    run_on_start = False
+    RESULTS_WINDOW = datetime.timedelta(hours=3)
+    MIN_POLL_SECONDS = 60
+    MAX_POLL_SECONDS = 600
+    MAX_SLEEP_SECONDS = 6 * 3600
+
+    error_sleep_seconds = MIN_POLL_SECONDS
 
     def __init__(self, client):
         super().__init__(client)
         self.redis = redis.get_client()
         self._channel = None
+        self.polled_sessions: set[datetime.datetime] = set()
+        self.polling_session: Optional[datetime.datetime] = None
+        self.poll_seconds = self.MIN_POLL_SECONDS
+        self.wait_seconds = 0
 
     @property
     def channel(self):
@@ -241,30 +187,96 @@ class F1Results(CrontabDiscordTask):
             self._channel = self.client.get_channel(config.DISCORD_F1_CHANNEL_ID)
         return self._channel
 
+    def calculate_sleep_seconds(self) -> int:
+        return self.wait_seconds
+
     async def work(self):
+        session = await self.get_next_session()
+        if not session:
+            self.wait_seconds = self.MAX_SLEEP_SECONDS
+            return
+
+        # Wait until the session is expected to end. Long waits are capped,
+        # so that changes to the schedule are picked up.
+        expected_end = session.timestamp + RESULTS_SESSIONS[session.type_]
+        wait_seconds = (expected_end - utc_now()).total_seconds()
+        if wait_seconds > 0:
+            self.wait_seconds = min(int(wait_seconds) + 1, self.MAX_SLEEP_SECONDS)
+            return
+
+        if session.timestamp != self.polling_session:
+            self.polling_session = session.timestamp
+            self.poll_seconds = self.MIN_POLL_SECONDS
+        if await self.post_results():
+            self.polled_sessions.add(session.timestamp)
+            self.wait_seconds = 0
+            return
+
+        deadline = expected_end + self.RESULTS_WINDOW
+        if utc_now() + datetime.timedelta(seconds=self.poll_seconds) >= deadline:
+            logger.warning('No F1 results found before %s', deadline)
+            self.polled_sessions.add(session.timestamp)
+            self.wait_seconds = 0
+            return
+        self.wait_seconds = self.poll_seconds
+        self.poll_seconds = min(self.poll_seconds * 2, self.MAX_POLL_SECONDS)
+
+    async def get_next_session(self) -> Optional[Session]:
+        """Return the next session with results that haven't been polled."""
+        season = await f1.schedule.get_season()
+        now = utc_now()
+        sessions = [
+            session
+            for race in season.races
+            for session in race.sessions
+            if session.type_ in RESULTS_SESSIONS
+            and session.timestamp not in self.polled_sessions
+            and session.timestamp + RESULTS_SESSIONS[session.type_] + self.RESULTS_WINDOW > now
+        ]
+        return min(sessions, key=lambda session: session.timestamp, default=None)
+
+    async def post_results(self) -> bool:
+        """
+        Post the results of the latest session if it ended. Return whether
+        there's nothing else to do for the session.
+        """
         session = await f1.get_latest_session(self.client)
         last_handled_session = await self.get_redis()
         if not session:
-            return
+            return False
         if str(session) == last_handled_session:
-            return
+            return True
         if session.event.is_testing():
-            return
+            return True
         if session.name.lower() not in self.ALLOWED_SESSIONS:
-            return
+            return True
 
+        # Check the session status before loading anything else
         try:
-            await self.client.loop.run_in_executor(None, session.load)
+            session_status = await run_io(fastf1_api.session_status_data, session.api_path)
+        except fastf1_api.SessionNotAvailableError:
+            return False
+        if not session_status['Status'] or session_status['Status'][-1].lower() != 'ends':
+            return False
+
+        # Only the results are needed, skip telemetry, weather and race
+        # control messages, and the laps unless the results are built from them
+        laps = session.name.lower() in self.QUALI_SESSIONS
+        try:
+            await run_io(session.load, laps=laps, telemetry=False, weather=False, messages=False)
         except fastf1.core.DataNotLoadedError:
-            return
+            return False
+        await run_io(f1.fastf1_cache.evict)
 
-        session_status = session.session_status['Status'].iloc[-1]
-        if session_status.lower() != 'ends':
-            return
+        # The positions are missing until the results are published
+        if not self.has_positions(session):
+            logger.info('No positions in the %s results yet', session)
+            return False
 
         msg = self.build_message(session)
         await self.channel.send(content=msg)
         await self.set_redis(str(session))
+        return True
 
     async def get_redis(self) -> str:
         value = await self.redis.get(REDIS_KEY)
@@ -274,6 +286,11 @@ class F1Results(CrontabDiscordTask):
     async def set_redis(self, name: str) -> None:
         await self.redis.set(REDIS_KEY, name)
 
+    @staticmethod
+    def has_positions(session: fastf1.core.Session) -> bool:
+        results = session.results
+        return results is not None and not results.empty and results.Position.notnull().any()
+
     def build_message(self, session: fastf1.core.Session) -> str:
         name = session.session_info.get('Meeting', {}).get('Name', '').replace('Grand Prix', 'GP')
         lines = [f'# {name} {session.name} results']
@@ -295,7 +312,7 @@ class F1Results(CrontabDiscordTask):
             f' | {pos_change}'
             f'   {line.Abbreviation}'
             f'   {time:<11}'
-            f'   {int(line.Points):>2}`'
+            f'   {self.format_int(line.Points):>2}`'
         )
 
     def format_quali_result(self, line) -> str:
@@ -305,15 +322,21 @@ class F1Results(CrontabDiscordTask):
         q3 = self.format_time('1', line.Q3, quali=True)
         return (
             f'{emote}'
-            f'   `{int(line.Position):>2}'
+            f'   `{self.format_int(line.Position):>2}'
             f'   {line.Abbreviation}'
             f'   {q1:<11}'
             f'   {q2:<11}'
             f'   {q3:<11}`'
         )
 
+    @staticmethod
+    def format_int(value) -> str:
+        return '' if pd.isnull(value) else str(int(value))
+
     @staticmethod
     def format_position_change(line) -> str:
+        if pd.isnull(line.GridPosition) or pd.isnull(line.Position):
+            return '  –'
         position_change = int(line.GridPosition - line.Position)
         change_symbol = '▲' if position_change > 0 else '▽'
         if position_change == 0:
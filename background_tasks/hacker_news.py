@@ -3,10 +3,10 @@ from __future__ import annotations
 import asyncio
 import logging
 
-from aiohttp_requests import requests
-
 import config
 import utils.datetime
+import utils.http
+import utils.lists
 import utils.redis
 import utils.urls
 from background_tasks.base import CrontabDiscordTask
@@ -18,20 +18,26 @@ class HackerNewsTask(CrontabDiscordTask):
     URL = 'https://hn.algolia.com/api/v1/search_by_date?numericFilters=points>=300&page={}'
     REDIS_KEY = 'hacker_news_seen_items'
     REDIS_MAX_LENGTH = 200
+    NUM_PAGES = 5
+    PAGE_CONCURRENCY = 2
 
     crontab = '*/5 * * * *'
+    jitter_seconds = 30
     run_on_start = False
 
     def __init__(self, client):
         super().__init__(client)
         self.redis = utils.redis.get_client()
+        self.pages_cache: dict[int, tuple[dict, dict]] = {}
 
-    async def get_seen_item_ids(self) -> list[int]:
-        value = await utils.redis.get_fifo_list(self.redis, self.REDIS_KEY)
+    async def get_seen_item_ids(self) -> set[str]:
+        value = await utils.redis.get_seen_set(self.redis, self.REDIS_KEY)
         return value
 
-    async def set_seen_item_ids(self, item_ids: list[int]) -> None:
-        await utils.redis.set_fifo_list(self.redis, self.REDIS_KEY, item_ids, self.REDIS_MAX_LENGTH)
+    async def add_seen_item_ids(self, item_ids: list[int]) -> list[int]:
+        return await utils.redis.add_to_seen_set(
+            self.redis, self.REDIS_KEY, item_ids, self.REDIS_MAX_LENGTH
+        )
 
     async def work(self):
         items = await self.get_new_items()
@@ -40,26 +46,27 @@ class HackerNewsTask(CrontabDiscordTask):
         await self.post_embeds(embeds)
 
     async def get_new_items(self) -> list[dict]:
-        items = await self.get_items()
+        seen_item_ids = await self.get_seen_item_ids()
+        items = await self.get_items(seen_item_ids)
 
-        # Filter new items only
+        # Filter new items only, adding them to the seen items in redis
         item_ids = [item['id'] for item in items]
-        seen_item_ids = await self.get_seen_item_ids()
-        new_item_ids = set(item_ids) - set(seen_item_ids)
+        new_item_ids = set(await self.add_seen_item_ids(item_ids))
         new_items = [item for item in items if item['id'] in new_item_ids]
 
-        # Update the seen items ids in redis
-        seen_item_ids.extend(new_item_ids)
-        await self.set_seen_item_ids(seen_item_ids)
-
         return new_items
 
-    async def get_items(self) -> list[dict]:
-        # Request 5 pages of items, i.e. last 100 items (20 items per page)
+    async def get_items(self, seen_item_ids: set[str]) -> list[dict]:
+        # Request up to 5 pages of items, i.e. last 100 items (20 items per
+        # page), a few pages at a time. Items are sorted by date, so stop once
+        # a page only has seen items.
         raw_hits = []
-        for page_num in range(5):
-            data = await self._send_request(page_num)
-            raw_hits.extend(data.get('hits', []))
+        for page_nums in utils.lists.chunks(range(self.NUM_PAGES), self.PAGE_CONCURRENCY):
+            pages = await asyncio.gather(*(self._send_request(page_num) for page_num in page_nums))
+            for data in pages:
+                raw_hits.extend(data.get('hits', []))
+            if any(self._has_only_seen_items(data, seen_item_ids) for data in pages):
+                break
 
         hits = []
         for hit in raw_hits:
@@ -78,11 +85,33 @@ class HackerNewsTask(CrontabDiscordTask):
         hits.reverse()
         return hits
 
+    @staticmethod
+    def _has_only_seen_items(data: dict, seen_item_ids: set[str]) -> bool:
+        return all(hit['objectID'] in seen_item_ids for hit in data.get('hits', []))
+
     async def _send_request(self, page_num: int) -> dict:
         url = self.URL.format(page_num)
-        res = await requests.session.get(url)
+
+        # Only get the page if it changed since the last request
+        headers = {}
+        cached_headers, cached_data = self.pages_cache.get(page_num, ({}, None))
+        if 'ETag' in cached_headers:
+            headers['If-None-Match'] = cached_headers['ETag']
+        if 'Last-Modified' in cached_headers:
+            headers['If-Modified-Since'] = cached_headers['Last-Modified']
+
+        res = await utils.http.get_session().get(url, headers=headers)
+        if res.status == 304 and cached_data is not None:
+            res.release()
+            return cached_data
         res.raise_for_status()
         data = await res.json()
+
+        cache_headers = {
+            name: res.headers[name] for name in ('ETag', 'Last-Modified') if name in res.headers
+        }
+        if cache_headers:
+            self.pages_cache[page_num] = (cache_headers, data)
         return data
 
     @staticmethod
@@ -110,7 +139,9 @@ class HackerNewsTask(CrontabDiscordTask):
                 'username': 'HackerNews',
                 'avatar_url': 'https://cdn.discordapp.com/attachments/780877442256470058/1163766513979887636/images.png',
             }
-            res = await requests.session.post(config.DISCORD_HACKERNEWS_WEBHOOK_URL, json=data)
+            res = await utils.http.get_session('discord').post(
+                config.DISCORD_HACKERNEWS_WEBHOOK_URL, json=data
+            )
             if res.status >= 400:
                 logger.error('Error sending embed. Status code %d. Data: %s', res.status, data)
             await asyncio.sleep(1)  # Don't spam too fast
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import itertools
 import logging
 
@@ -9,10 +10,12 @@ import config
 from background_tasks.base import CrontabDiscordTask
 from utils import redis, yts_api
 from utils.datetime import utc_now
-from utils.imdb import get_movie_details
+from utils.imdb import get_movie_rating
 
 REDIS_KEY = 'rarbg_handled_movies'
 MIN_IMDB_VOTES = 15000
+MAX_MOVIES_PER_YEAR = 100
+IMDB_CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +26,7 @@ class YtsNewMoviesTask(CrontabDiscordTask):
     """
 
     crontab = '0 * * * * 0'
+    jitter_seconds = 60
     run_on_start = True
 
     def __init__(self, client):
@@ -41,8 +45,13 @@ class YtsNewMoviesTask(CrontabDiscordTask):
 
         logger.info('Got %d new movies', len(new_movies))
 
-        for movie in new_movies:
-            await self.handle_new_movie(movie)
+        handled_ids = []
+        try:
+            for movie in new_movies:
+                await self.handle_new_movie(movie)
+                handled_ids.append(movie['imdb_id'])
+        finally:
+            await redis.add_set_members(self.redis, REDIS_KEY, handled_ids)
 
     async def get_new_movies(self) -> list[dict]:
         movies = await self.get_movies()
@@ -54,9 +63,11 @@ class YtsNewMoviesTask(CrontabDiscordTask):
     async def get_movies() -> list[dict]:
         year = utc_now().year
         movies = []
-        movies_this_year = await yts_api.list_all_movies(str(year))
-        movies_prev_year = await yts_api.list_all_movies(str(year - 1))
-        for movie in itertools.chain(movies_this_year[:100], movies_prev_year[:100]):
+        movies_this_year, movies_prev_year = await asyncio.gather(
+            yts_api.list_all_movies(str(year), max_results=MAX_MOVIES_PER_YEAR),
+            yts_api.list_all_movies(str(year - 1), max_results=MAX_MOVIES_PER_YEAR),
+        )
+        for movie in itertools.chain(movies_this_year, movies_prev_year):
             torrents = {torrent['quality']: torrent for torrent in movie['torrents'] if torrent}
             if '2160p' not in torrents:
                 logger.error("Movie does't have 2160 torrent. Movie: %s", movie)
@@ -81,24 +92,26 @@ class YtsNewMoviesTask(CrontabDiscordTask):
         return movies
 
     async def filter_seen_ids(self, movies: list[dict]) -> list[dict]:
-        new_movies = []
-        for movie in movies:
-            movie_id = movie['imdb_id']
-            if not await self.redis.sismember(REDIS_KEY, movie_id):
-                new_movies.append(movie)
+        movie_ids = [movie['imdb_id'] for movie in movies]
+        new_movie_ids = set(await redis.filter_set_members(self.redis, REDIS_KEY, movie_ids))
+        new_movies = [movie for movie in movies if movie['imdb_id'] in new_movie_ids]
         return new_movies
 
-    @staticmethod
-    async def filter_low_ratings(all_movies: list[dict]) -> list[dict]:
-        movies = []
-        for movie in all_movies:
+    async def filter_low_ratings(self, all_movies: list[dict]) -> list[dict]:
+        semaphore = asyncio.Semaphore(IMDB_CONCURRENCY)
+
+        async def has_enough_votes(movie: dict) -> bool:
             movie_id = movie['imdb_id']
-            try:
-                data = await get_movie_details(movie_id)
-                if data.get('votes', 0) >= MIN_IMDB_VOTES:
-                    movies.append(movie)
-            except:
-                logger.exception('Error getting movie %s details', movie_id)
+            async with semaphore:
+                try:
+                    data = await get_movie_rating(self.redis, movie_id)
+                except:
+                    logger.exception('Error getting movie %s details', movie_id)
+                    return False
+            return data['votes'] >= MIN_IMDB_VOTES
+
+        results = await asyncio.gather(*(has_enough_votes(movie) for movie in all_movies))
+        movies = [movie for movie, result in zip(all_movies, results) if result]
         return movies
 
     async def handle_new_movie(self, movie: dict) -> None:
@@ -124,6 +137,5 @@ class YtsNewMoviesTask(CrontabDiscordTask):
             content=f'<@{config.DISCORD_TARMO_USER_ID}> new movie:',
             embed=embed,
         )
-        await self.redis.sadd(REDIS_KEY, imdb_id)
 
         logger.info('Handled movie %s', imdb_id)
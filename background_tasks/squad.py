@@ -3,9 +3,8 @@ from __future__ import annotations
 import json
 import logging
 
-from aiohttp_requests import requests
-
 from background_tasks.base import CrontabDiscordTask
+from utils import http
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +119,7 @@ layers_data = {}
 class SquadLayersTask(CrontabDiscordTask):
     URL = 'https://raw.githubusercontent.com/Squad-Wiki/squad-wiki-pipeline-map-data/master/completed_output/_Current%20Version/finished.json'
     crontab = '0 * * * *'
+    jitter_seconds = 60
     run_on_start = True
 
     async def work(self):
@@ -134,7 +134,7 @@ class SquadLayersTask(CrontabDiscordTask):
 
     async def _fetch_data(self) -> dict:
         logger.info('Fetching data')
-        res = await requests.session.get(self.URL)
+        res = await http.get_session('github').get(self.URL)
         res.raise_for_status()
         data = json.loads(await res.text())
         return data
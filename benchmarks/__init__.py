@@ -0,0 +1,22 @@
+import os
+
+# The benchmarks run without the bot's environment, the required variables get dummy values
+for name in (
+    'DISCORD_TOKEN',
+    'DISCORD_SERVER_ID',
+    'DISCORD_LOUNGE_CHANNEL_ID',
+    'DISCORD_ADMIN_CHANNEL_ID',
+    'DISCORD_SQUAD_CHANNEL_ID',
+    'DISCORD_POSTSCRIPTUM_CHANNEL_ID',
+    'DISCORD_MOVIES_CHANNEL_ID',
+    'DISCORD_FINANCE_CHANNEL_ID',
+    'DISCORD_F1_CHANNEL_ID',
+    'VOICE_CREATOR_CHANNEL_ID',
+    'VOICE1_CHANNEL_ID',
+    'DISCORD_APOC_WEBHOOK_URL',
+    'DISCORD_HACKERNEWS_WEBHOOK_URL',
+    'CHATTER_ASSISTANT_ID',
+    'CHATTER_THREAD_ID',
+    'BM_TOKEN',
+):
+    os.environ.setdefault(name, '0')
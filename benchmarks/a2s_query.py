@@ -0,0 +1,175 @@
+"""
+Measure the A2S polls of the player tracker against local stub servers.
+
+Each stub is a UDP server that answers the A2S_INFO and A2S_PLAYER queries
+with a challenge first, like the real servers, after an optional delay.
+One stub never answers, to check that the per-query timeout holds. The
+tracked players are matched by name on the server they were last seen on.
+
+    python -m benchmarks.a2s_query [--polls 50] [--delay 0.05] [--timeout 0.5]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import struct
+import time
+
+HEADER = b'\xff\xff\xff\xff'
+CHALLENGE = 0x12345678
+
+
+class StubServer(asyncio.DatagramProtocol):
+    """A2S server that answers with the given info and player names."""
+
+    def __init__(
+        self, name: str, layer: str, player_names: list[str], delay: float = 0, silent=False
+    ):
+        self.name = name
+        self.layer = layer
+        self.player_names = player_names
+        self.delay = delay
+        self.silent = silent
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, packet, addr):
+        if self.silent or not packet.startswith(HEADER):
+            return
+        response = self.respond(packet[4:])
+        if response is not None:
+            asyncio.get_running_loop().call_later(
+                self.delay, self.transport.sendto, HEADER + response, addr
+            )
+
+    def respond(self, request: bytes):
+        if request.startswith(b'TSource Engine Query\x00'):
+            payload = request[len(b'TSource Engine Query\x00') :]
+            challenge = struct.unpack('<I', payload)[0] if len(payload) == 4 else None
+            if challenge != CHALLENGE:
+                return b'A' + struct.pack('<I', CHALLENGE)
+            return self.info()
+        if request.startswith(b'U'):
+            challenge = struct.unpack('<I', request[1:5])[0]
+            if challenge != CHALLENGE:
+                return b'A' + struct.pack('<I', CHALLENGE)
+            return self.players()
+        return None
+
+    def info(self) -> bytes:
+        return b''.join(
+            [
+                b'I',
+                struct.pack('<B', 17),  # Protocol
+                cstring(self.name),
+                cstring(self.layer),
+                cstring('squad'),  # Folder
+                cstring('Squad'),  # Game
+                # App id, players, max players, bots
+                struct.pack('<HBBB', 0, len(self.player_names), 100, 0),
+                b'dl',  # Dedicated, Linux
+                struct.pack('<BB', 0, 1),  # Password, VAC
+                cstring('1.0.0'),
+            ]
+        )
+
+    def players(self) -> bytes:
+        players = [
+            struct.pack('<B', 0) + cstring(name) + struct.pack('<if', 0, 60.0)
+            for name in self.player_names
+        ]
+        return b'D' + struct.pack('<B', len(players)) + b''.join(players)
+
+
+def cstring(value: str) -> bytes:
+    return value.encode() + b'\x00'
+
+
+async def start_stub(stub: StubServer) -> int:
+    """Start the stub on localhost and return its port."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: stub, local_addr=('127.0.0.1', 0))
+    return transport.get_extra_info('sockname')[1]
+
+
+def make_server(server_id: str, port: int):
+    from utils.battlemetrics import ServerSnapshot
+
+    return ServerSnapshot(
+        id=server_id,
+        name=f'Server {server_id}',
+        ip='127.0.0.1',
+        port=port,
+        port_query=port,
+        country='ch',
+        emote=None,
+        game='squad',
+        players=0,
+        max_players=0,
+        layer='',
+        next_layer=None,
+        queue=0,
+    )
+
+
+async def run(polls: int, delay: float, timeout: float) -> None:
+    from utils.battlemetrics import PlayerSnapshot, PlayerTracker
+
+    stubs = {
+        '1': StubServer('Stub 1', 'Narva RAAS v1', ['Alice', 'someone'], delay),
+        '2': StubServer('Stub 2', 'Gorodok AAS v2', ['Carol'], delay),
+        '3': StubServer('Silent', '', [], silent=True),
+    }
+    servers = {
+        server_id: make_server(server_id, await start_stub(stub))
+        for server_id, stub in stubs.items()
+    }
+
+    tracker = PlayerTracker(servers, ['a', 'b', 'c', 'd'], token='', a2s_timeout=timeout)
+    tracker.bm_polled = time.monotonic() + polls * (timeout + 1)  # No BattleMetrics polls
+    tracker.servers = dict(servers)
+    tracker.names = {'a': 'Alice', 'b': 'Bob', 'c': 'Carol', 'd': 'Dave'}
+    # As seen by the last BattleMetrics poll. Bob was on the silent server and keeps
+    # that snapshot, Dave left the first server.
+    tracker.players = {
+        'a': PlayerSnapshot('a', 'Alice', servers['1']),
+        'b': PlayerSnapshot('b', 'Bob', servers['3']),
+        'c': PlayerSnapshot('c', 'Carol', servers['2']),
+        'd': PlayerSnapshot('d', 'Dave', servers['1']),
+    }
+
+    # The silent stub times out on every poll
+    logging.getLogger('utils.battlemetrics').setLevel(logging.ERROR)
+    times = []
+    for _ in range(polls):
+        start = time.perf_counter()
+        players = await tracker.get_players()
+        times.append(time.perf_counter() - start)
+
+    for player_id, player in sorted(players.items()):
+        server = f'{player.server.name} ({player.server.players} players)' if player else '-'
+        print(f'{player_id:<4}{tracker.names[player_id]:<8}{server}')
+    print(
+        f'{polls} polls, median {statistics.median(times) * 1000:.1f}ms, '
+        f'max {max(times) * 1000:.1f}ms, timeout {timeout * 1000:.0f}ms'
+    )
+    for stub in stubs.values():
+        stub.transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--polls', type=int, default=50)
+    parser.add_argument(
+        '--delay', type=float, default=0.05, help='seconds the stubs wait to answer'
+    )
+    parser.add_argument('--timeout', type=float, default=0.5, help='seconds per query')
+    args = parser.parse_args()
+    asyncio.run(run(args.polls, args.delay, args.timeout))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Compare the render time and peak memory of the finance chart renderers.
+
+Each renderer runs in a fresh process, with synthetic 1D/5M and 1Y/1D data,
+so that the imports and Kaleido's Chromium subprocess are measured too. Peak
+memory is the sum of the peak RSS of the process and of its subprocesses.
+Linux only, it reads /proc.
+
+    python -m benchmarks.finance_chart [--renders 20]
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Seconds to wait for the results of a renderer
+TIMEOUT = 600
+
+
+def make_chart_data(period: str, interval: str, index: pd.DatetimeIndex):
+    from utils.finance_chart import ChartData
+
+    rng = np.random.default_rng(0)
+    close = 100 + rng.normal(0, 1, len(index)).cumsum()
+    open_ = np.roll(close, 1)
+    open_[0] = close[0]
+    spread = np.abs(rng.normal(0, 0.5, len(index)))
+    data = pd.DataFrame(
+        {
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+        },
+        index=index,
+    )
+    return ChartData(symbol='TEST', name='Test Inc.', period=period, interval=interval, data=data)
+
+
+def sample_chart_data():
+    intraday = pd.date_range(
+        '2023-03-10 09:30', '2023-03-10 15:55', freq='5min', tz='America/New_York'
+    )
+    daily = pd.bdate_range('2022-03-10', '2023-03-10', tz='America/New_York')
+    return [make_chart_data('1d', '5m', intraday), make_chart_data('1y', '1d', daily)]
+
+
+def peak_rss(pid: int) -> int:
+    """Return the peak RSS, in bytes, of the process and its subprocesses."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pids = [pid]
+    while pids:
+        pid = pids.pop()
+        pids.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+def run_renderer(name: str, renders: int, results) -> None:
+    from utils.finance_chart import FinanceCandleChart, FinanceLineChart, get_renderer
+
+    start = time.perf_counter()
+    renderer = get_renderer(name)
+    renderer.warm_up()
+    warm_up_time = time.perf_counter() - start
+
+    times = []
+    size = 0
+    for chart_data in sample_chart_data():
+        for chart_class in [FinanceLineChart, FinanceCandleChart]:
+            chart = chart_class(chart_data)
+            for _ in range(renders):
+                start = time.perf_counter()
+                image = renderer.render(chart)
+                times.append(time.perf_counter() - start)
+            size += len(image)
+
+    results.put(
+        {
+            'renderer': name,
+            'warm_up': warm_up_time,
+            'median': float(np.median(times)),
+            'p95': float(np.percentile(times, 95)),
+            'peak_rss': peak_rss(os.getpid()),
+            'avg_size': size / 4,
+        }
+    )
+
+
+def get_result(process, results) -> Optional[dict]:
+    """Wait for the result of the process, `None` if it dies or times out."""
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                return None
+    process.kill()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--renders', type=int, default=20, help='renders per chart')
+    parser.add_argument('--renderers', nargs='+', default=['plotly', 'matplotlib'])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    print(
+        f'{"renderer":<12}{"warm up":>10}{"median":>10}{"p95":>10}{"peak RSS":>12}{"PNG size":>12}'
+    )
+    for name in args.renderers:
+        process = context.Process(target=run_renderer, args=(name, args.renders, results))
+        process.start()
+        result = get_result(process, results)
+        process.join()
+        if result is None or process.exitcode != 0:
+            print(f'{name:<12}failed, exit code {process.exitcode}')
+            continue
+        print(
+            f'{result["renderer"]:<12}'
+            f'{result["warm_up"]:>9.2f}s'
+            f'{result["median"] * 1000:>8.1f}ms'
+            f'{result["p95"] * 1000:>8.1f}ms'
+            f'{result["peak_rss"] / 1024 / 1024:>10.0f}MB'
+            f'{result["avg_size"] / 1024:>10.0f}KB'
+        )
+
+
+if __name__ == '__main__':
+    main()
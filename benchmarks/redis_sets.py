@@ -0,0 +1,73 @@
+"""
+Compare checking and adding seen ids one by one with the batched helpers
+of utils.redis.
+
+Each round checks `--ids` ids against a set that has `--seen` of them
+already, and adds the unseen ones. One by one it's one SISMEMBER and one
+SADD round trip per id, batched it's one pipeline and one SADD. Runs on
+fakeredis by default, from requirements-dev.txt, or on a real server with
+`--url`.
+
+    python -m benchmarks.redis_sets [--ids 200] [--seen 100] [--url redis://localhost]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils import redis
+
+KEY = 'benchmark_seen_ids'
+
+
+async def one_by_one(client, ids: list[str]) -> int:
+    round_trips = 0
+    for id_ in ids:
+        round_trips += 1
+        if not await client.sismember(KEY, id_):
+            round_trips += 1
+            await client.sadd(KEY, id_)
+    return round_trips
+
+
+async def batched(client, ids: list[str]) -> int:
+    new_ids = await redis.filter_set_members(client, KEY, ids)
+    await redis.add_set_members(client, KEY, new_ids)
+    return 2 if new_ids else 1
+
+
+async def run(args) -> None:
+    if args.url:
+        client = redis.aioredis.from_url(args.url)
+    else:
+        import fakeredis
+
+        client = fakeredis.FakeAsyncRedis()
+
+    ids = [f'tt{idx:07}' for idx in range(args.ids)]
+    print(f'{"method":<12}{"round trips":>12}{"median":>11}')
+    for name, method in [('one by one', one_by_one), ('batched', batched)]:
+        times = []
+        for _ in range(args.rounds):
+            await client.delete(KEY)
+            await client.sadd(KEY, *ids[: args.seen])
+            start = time.perf_counter()
+            round_trips = await method(client, ids)
+            times.append(time.perf_counter() - start)
+        print(f'{name:<12}{round_trips:>12}{statistics.median(times) * 1000:>9.1f}ms')
+    await client.delete(KEY)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ids', type=int, default=200)
+    parser.add_argument('--seen', type=int, default=100, help='ids already in the set')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--url', help='Redis server, fakeredis if not given')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Measure the latency of concurrent callers of a `SingleFlightCache` function.
+
+Each round clears the cache and starts `--callers` concurrent calls of a
+decorated coroutine that sleeps `--delay` seconds, spread over `--keys`
+different arguments. The upstream calls are counted, only one per key
+should be made, and the p50/p99 latency of the callers is reported.
+
+The previous implementation, which cached a `CoroutinePromise` under a
+global lock and polled it every 100ms, is kept below to compare the
+current one with it.
+
+    python -m benchmarks.single_flight_cache [--callers 100] [--keys 1] [--delay 0.05]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from aiocache import cached as base_cached
+
+from utils.caching import SingleFlightCache
+
+
+class PromiseSingleFlightCache(base_cached):
+    """The previous `SingleFlightCache`."""
+
+    lock = asyncio.Lock()
+
+    async def decorator(self, f, *args, cache_read=True, cache_write=True, **kwargs):
+        async with self.lock:
+            promise = None
+            key = self.get_cache_key(f, args, kwargs)
+
+            if cache_read:
+                promise = await self.get_from_cache(key)
+
+            if promise is None:
+                promise = CoroutinePromise()
+                if cache_write:
+                    await self.set_in_cache(key, promise)
+                promise.set_coroutine(f(*args, **kwargs))
+
+        return await promise.get_result()
+
+
+class CoroutinePromise:
+    def __init__(self, sleep_time=0.1):
+        self.sleep_time = sleep_time
+
+        self.coroutine = None
+        self.result = None
+        self.exception = None
+
+        self.coroutine_set = False
+        self.awaited = False
+        self.got_result = False
+
+    def set_coroutine(self, coroutine):
+        self.coroutine = coroutine
+        self.coroutine_set = True
+
+    async def get_result(self):
+        while not self.coroutine_set:
+            await asyncio.sleep(self.sleep_time)
+
+        if not self.awaited:
+            self.awaited = True
+            try:
+                self.result = await self.coroutine
+            except Exception as exc:
+                self.exception = exc
+            self.got_result = True
+
+        while not self.got_result:
+            await asyncio.sleep(self.sleep_time)
+
+        if self.exception:
+            raise self.exception
+        return self.result
+
+
+async def run_round(function, callers: int, keys: int) -> list[float]:
+    async def call(key: int) -> float:
+        start = time.perf_counter()
+        await function(key)
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(call(idx % keys) for idx in range(callers)))
+
+
+async def run(name: str, decorator, args) -> None:
+    upstream_calls = 0
+
+    @decorator(ttl=60)
+    async def function(key: int) -> int:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(args.delay)
+        return key
+
+    times = []
+    for _ in range(args.rounds):
+        await function.cache.clear()
+        times += await run_round(function, args.callers, args.keys)
+
+    percentiles = statistics.quantiles(times, n=100)
+    print(
+        f'{name:<20}{upstream_calls / args.rounds:>10.0f}'
+        f'{percentiles[49] * 1000:>9.1f}ms{percentiles[98] * 1000:>9.1f}ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--callers', type=int, default=100)
+    parser.add_argument('--keys', type=int, default=1, help='different arguments')
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds per upstream call')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"cache":<20}{"upstream":>10}{"p50":>11}{"p99":>11}')
+    asyncio.run(run('before', PromiseSingleFlightCache, args))
+    asyncio.run(run('after', SingleFlightCache, args))
+
+
+if __name__ == '__main__':
+    main()
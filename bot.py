@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from utils import startup  # First, so that the startup times include all the imports
+
 import logging
 import sys
 
@@ -7,7 +9,7 @@ import discord
 from discord import RawReactionActionEvent
 
 import config
-from client import COMMANDS, REACTION_HANDLERS, Client
+from client import Client
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,7 @@ client = Client(intents=intents)
 
 def main():
     config.setup_logging()
+    startup.mark('imports')
     client.run(config.DISCORD_TOKEN)
 
 
@@ -35,20 +38,18 @@ async def remove_banner():
 
 @client.event
 async def on_message(message):
-    for command in COMMANDS:
-        if await command.should_handle(message):
-            log_message(message)
-            await command.handle_message(message)
-            return
+    command = await client.command_dispatcher.get_command(message)
+    if command:
+        log_message(message)
+        await command.handle_message(message)
 
 
 @client.event
 async def on_reaction_add(reaction, user):
-    for handler in REACTION_HANDLERS:
-        if await handler.should_handle(reaction, user):
-            log_reaction(reaction, user)
-            await handler.handle_message(reaction, user)
-            return
+    handler = await client.reaction_dispatcher.get_handler(reaction, user)
+    if handler:
+        log_reaction(reaction, user)
+        await handler.handle_message(reaction, user)
 
 
 @client.event
@@ -69,8 +70,7 @@ async def on_raw_reaction_add(event: RawReactionActionEvent):
 
     # We only want to handle events on messages that aren't cached by the
     # client, as the client won't handle them automatically.
-    cached_messages_ids = (message.id for message in client.cached_messages)
-    if event.message_id in cached_messages_ids:
+    if client.get_cached_message(event.message_id):
         return
 
     # Don't handle PMs
@@ -84,8 +84,7 @@ async def on_raw_reaction_add(event: RawReactionActionEvent):
 
     # Get message and cache it
     channel = client.get_channel(event.channel_id)
-    message = await channel.fetch_message(event.message_id)
-    client._connection._messages.append(message)
+    message = await client.fetch_and_cache_message(channel, event.message_id)
 
     # Get reaction and member objects, and handle the reaction
     data = {'me': event.user_id == client.user.id}
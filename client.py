@@ -1,72 +1,117 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import functools
+import logging
+from typing import TYPE_CHECKING, Any, Optional
 
 import discord
-import openai
 from discord import Intents
 
-import background_tasks
-import commands
 import config
-from commands.base import BaseCommand
-from helpers.chatter import Chatter
+from background_tasks.base import Scheduler
+from commands.base import BaseReactionHandler, CommandDispatcher, ReactionDispatcher, Registry
+from utils import f1, http, lazy, openai, startup
+from utils.discord.cache import CachedConnectionState
+from utils.executors import executors, run_io
 
-COMMANDS = []
-REACTION_HANDLERS = []
+if TYPE_CHECKING:
+    from helpers.chatter import Chatter
+
+logger = logging.getLogger(__name__)
 
 
 class Client(discord.Client):
     def __init__(self, *, intents: Intents, **options: Any) -> None:
         super().__init__(intents=intents, **options)
-        self.squad_who_command = None
-        self.ps_who_command = None
+        self.registry = Registry(config.ENABLED_HANDLERS, config.DISABLED_HANDLERS)
+        self.command_dispatcher = CommandDispatcher()
+        self.reaction_dispatcher = ReactionDispatcher()
+        self.scheduler = Scheduler(self)
+        self.message_fetches: dict[int, asyncio.Task] = {}
+
+    @functools.cached_property
+    def chatter(self) -> Chatter:
+        from helpers.chatter import Chatter
+
+        return Chatter(openai.get_client(), config.CHATTER_ASSISTANT_ID, config.CHATTER_THREAD_ID)
+
+    def _get_state(self, **options: Any) -> CachedConnectionState:
+        return CachedConnectionState(
+            dispatch=self.dispatch,
+            handlers=self._handlers,
+            hooks=self._hooks,
+            http=self.http,
+            **options,
+        )
+
+    def get_cached_message(self, message_id: int) -> Optional[discord.Message]:
+        """Return the message from the client's cache, if it's there."""
+        return self._connection._get_message(message_id)
+
+    async def fetch_and_cache_message(
+        self, channel: discord.abc.Messageable, message_id: int
+    ) -> discord.Message:
+        """
+        Fetch a message and add it to the client's cache.
+
+        Concurrent calls for the same message share a single request.
+        """
+        task = self.message_fetches.get(message_id)
+        if task is None:
+            task = self.loop.create_task(self._fetch_and_cache_message(channel, message_id))
+            self.message_fetches[message_id] = task
+            task.add_done_callback(lambda _: self.message_fetches.pop(message_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_cache_message(
+        self, channel: discord.abc.Messageable, message_id: int
+    ) -> discord.Message:
+        message = await channel.fetch_message(message_id)
+        if self._connection._messages is not None and not self.get_cached_message(message_id):
+            self._connection._messages.append(message)
+        return message
 
     async def setup_hook(self) -> None:
         await super().setup_hook()
-        self.register_commands()
-        self.register_reaction_handlers()
+        await http.sessions.start()
+        self.register_handlers()
         self.register_background_tasks()
+        self.loop.create_task(self.preload())
+        startup.mark('setup')
 
-    def register_commands(self):
-        """Register all available commands."""
-        self.register_command(commands.ChatCommand)
-        self.register_command(commands.GenerateImageCommand)
-        squad_who_command = self.register_command(
-            commands.WhoCommand, 'squad', config.DISCORD_SQUAD_CHANNEL_ID
-        )
-        ps_who_command = self.register_command(
-            commands.WhoCommand, 'postscriptum', config.DISCORD_POSTSCRIPTUM_CHANNEL_ID
-        )
-        self.register_command(commands.F1CreateEventsCommand)
-        self.register_command(commands.CreateEvents)
-        self.register_command(commands.DeleteEvents)
-        self.register_command(commands.TtsCommand)
-
-        self.squad_who_command = squad_who_command
-        self.ps_who_command = ps_who_command
+    async def close(self) -> None:
+        await super().close()
+        await http.sessions.close()
+        executors.shutdown()
 
-    def register_command(self, command_class, *args, **kwargs) -> BaseCommand:
-        """Register a command class."""
-        command = command_class(self, *args, **kwargs)
-        COMMANDS.append(command)
-        return command
+    async def preload(self) -> None:
+        """
+        Import the lazily imported modules once the bot is ready, so that
+        their first use doesn't wait for them, and report the startup.
+        """
+        await self.wait_until_ready()
+        startup.mark('ready')
+        await run_io(lazy.preload)
+        startup.mark('preloaded')
+        await run_io(startup.report, config.STARTUP_REPORT_FILE)
+        await self.warm_up_fastf1_cache()
 
-    def register_reaction_handlers(self):
-        """Register all available reaction handlers."""
+    async def warm_up_fastf1_cache(self) -> None:
+        try:
+            await run_io(f1.fastf1_cache.warm_up)
+        except Exception:
+            logger.exception('Error warming up the FastF1 cache')
 
-    def register_reaction_handler(self, handler_class):
-        """Register a reaction handler class."""
-        command = handler_class(self)
-        REACTION_HANDLERS.append(command)
+    def register_handlers(self):
+        """Register the enabled commands and reaction handlers."""
+        for handler in self.registry.create(self, 'commands'):
+            if isinstance(handler, BaseReactionHandler):
+                self.reaction_dispatcher.add(handler)
+            else:
+                self.command_dispatcher.add(handler)
 
     def register_background_tasks(self):
-        """Register all background tasks."""
-        self.loop.create_task(background_tasks.AstronomyPictureOfTheDayTask(self).start())
-        self.loop.create_task(background_tasks.BattlemetricsPlayersTask(self).start())
-        self.loop.create_task(background_tasks.DeleteChatConversations(self).start())
-        self.loop.create_task(background_tasks.F1DaySchedule(self).start())
-        self.loop.create_task(background_tasks.F1RaceWeek(self).start())
-        self.loop.create_task(background_tasks.F1Results(self).start())
-        self.loop.create_task(background_tasks.SquadLayersTask(self).start())
-        self.loop.create_task(background_tasks.YtsNewMoviesTask(self).start())
+        """Start the enabled background tasks."""
+        for task in self.registry.create(self, 'background_tasks'):
+            self.scheduler.add(task)
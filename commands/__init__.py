@@ -1,8 +1,28 @@
-from .chat import ChatCommand
-from .chatter import ChatterCommand, ChatterFrequencyCommand
-from .events import CreateEvents, DeleteEvents
-from .f1 import F1CreateEventsCommand
-from .finance import FinanceCandleChartCommand, FinanceLineChartCommand
-from .images import GenerateImageCommand
-from .tts import TtsCommand
-from .who import WhoCommand
+from utils.lazy import lazy_exports
+
+# The commands and reaction handlers by class name, and their modules. The
+# modules are imported when the handler is first used, see `Registry`
+HANDLERS = {
+    'ChatCommand': '.chat',
+    'ChatterCommand': '.chatter',
+    'ChatterFrequencyCommand': '.chatter',
+    'CreateEvents': '.events',
+    'DeleteEvents': '.events',
+    'F1CreateEventsCommand': '.f1',
+    'FinanceCandleChartCommand': '.finance',
+    'FinanceLineChartCommand': '.finance',
+    'GenerateImageCommand': '.images',
+    'PlayerStatsCommand': '.stats',
+    'TaskStatsCommand': '.tasks',
+    'TtsCommand': '.tts',
+    'WhoCommand': '.who',
+}
+# Only registered when they're in ENABLED_HANDLERS
+DISABLED_BY_DEFAULT = {
+    'ChatterCommand',
+    'ChatterFrequencyCommand',
+    'FinanceCandleChartCommand',
+    'FinanceLineChartCommand',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, HANDLERS)
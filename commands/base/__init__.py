@@ -1,2 +1,4 @@
 from .command import BaseCommand
+from .dispatcher import CommandDispatcher, ReactionDispatcher
 from .reaction_handler import BaseReactionHandler
+from .registry import Registry
@@ -7,6 +7,8 @@ import discord
 import config
 from utils.discord import roles
 
+from .stats import HandlerStats
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,8 +32,14 @@ class BaseCommand:
     allowed_users = []
     ignored_users = []
 
+    # Registration, see `Registry`
+    name = None
+    priority = 0
+    variants = None
+
     def __init__(self, client):
         self.client = client
+        self.stats = HandlerStats()
 
     async def should_handle(self, message):
         """Check if the command should handle the message."""
@@ -55,10 +63,10 @@ class BaseCommand:
             return False
 
         # Check that the member has the required role
-        member = self.get_message_member(message)
-        is_correct_role = roles.has_any_roles(member, self.roles) if self.roles else True
-        if not is_correct_role:
-            return False
+        if self.roles:
+            member = self.get_message_member(message)
+            if not roles.has_any_roles(member, self.roles):
+                return False
 
         # Don't handle messages from non-allowed users
         if self.allowed_users and message.author.id not in self.allowed_users:
@@ -89,9 +97,10 @@ class BaseCommand:
         of to the message's channel.
         """
         channel = self.get_response_channel(message, response_channel)
-        await self.pre_handle(message, channel)
-        response = await self.handle(message, channel)
-        await self.post_handle(message, channel, response)
+        with self.stats.measure():
+            await self.pre_handle(message, channel)
+            response = await self.handle(message, channel)
+            await self.post_handle(message, channel, response)
         if self.response_ttl is not None and response:
             await self.delete_response(response)
         return response
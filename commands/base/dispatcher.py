@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import logging
+import re
+from collections import Counter, defaultdict
+from typing import Optional
+
+import discord
+
+from .command import BaseCommand
+from .reaction_handler import BaseReactionHandler
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_CHANNELS = 'private'
+INLINE_FLAGS = {
+    re.IGNORECASE: 'i',
+    re.MULTILINE: 'm',
+    re.DOTALL: 's',
+    re.VERBOSE: 'x',
+    re.ASCII: 'a',
+}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'commands')
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.commands: list[tuple[int, BaseCommand]] = []
+
+
+class _CommandIndex:
+    """
+    Index of the commands available in a channel bucket.
+
+    Commands with a `command` prefix are stored in a character trie, so
+    walking the message content once yields every command whose prefix
+    matches. Commands with a `re_command` are combined into one precompiled
+    alternation that is used to discard messages that can't match any of
+    them with a single search. Each pattern keeps its own flags, and if the
+    patterns can't be combined, e.g. because two of them use the same group
+    name, they're searched one by one instead.
+    """
+
+    def __init__(self):
+        self.trie = _TrieNode()
+        self.re_commands: list[tuple[int, BaseCommand]] = []
+        self.re_combined: Optional[re.Pattern] = None
+
+    def add(self, order: int, command: BaseCommand) -> None:
+        if command.command is None and command.re_command is not None:
+            self.re_commands.append((order, command))
+            self.re_combined = _combine_patterns(
+                [command_.re_command for _, command_ in self.re_commands]
+            )
+            return
+
+        # Commands without a prefix end up in the root node so that they're
+        # always candidates, which keeps `BaseCommand.is_correct_command` the
+        # single source of truth for them.
+        node = self.trie
+        for char in (command.command or '').lower():
+            node = node.children.setdefault(char, _TrieNode())
+        node.commands.append((order, command))
+
+    def candidates(self, content: str) -> list[tuple[int, BaseCommand]]:
+        node = self.trie
+        candidates = list(node.commands)
+        for char in content:
+            node = node.children.get(char)
+            if node is None:
+                break
+            candidates.extend(node.commands)
+
+        if self.re_combined is not None:
+            if self.re_combined.search(content):
+                candidates.extend(self.re_commands)
+        else:
+            candidates.extend(
+                (order, command)
+                for order, command in self.re_commands
+                if command.re_command.search(content)
+            )
+
+        return candidates
+
+
+def _combine_patterns(patterns: list[re.Pattern]) -> Optional[re.Pattern]:
+    """
+    Combine the patterns into one alternation, with the flags of each one
+    scoped to its group. Return `None` if they can't be combined.
+    """
+    groups = []
+    for pattern in patterns:
+        flags = ''.join(letter for flag, letter in INLINE_FLAGS.items() if pattern.flags & flag)
+        groups.append(f'(?{flags}:{pattern.pattern})')
+    try:
+        return re.compile('|'.join(groups))
+    except re.error as e:
+        logger.info('Searching the command patterns one by one, they can\'t be combined: %s', e)
+        return None
+
+
+class CommandDispatcher:
+    """
+    Find the command that should handle a message.
+
+    Commands are bucketed by channel: commands without `channels` are
+    available everywhere, the rest only in their channels and, when
+    `allow_pm` is set, in private channels. A message is only tested against
+    the commands of its buckets that could match its content, and commands
+    keep the priority given by their registration order.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._global = _CommandIndex()
+        self._buckets: dict[object, _CommandIndex] = defaultdict(_CommandIndex)
+
+        # Metrics
+        self.messages = 0
+        self.candidates = 0
+        self.candidates_per_message: Counter[int] = Counter()
+        self.candidates_per_channel: Counter[int] = Counter()
+
+    def add(self, command: BaseCommand) -> None:
+        order = self._count
+        self._count += 1
+
+        if not command.channels:
+            self._global.add(order, command)
+            return
+
+        for channel_id in command.channels:
+            self._buckets[channel_id].add(order, command)
+        if command.allow_pm:
+            self._buckets[PRIVATE_CHANNELS].add(order, command)
+
+    async def get_command(self, message: discord.Message) -> Optional[BaseCommand]:
+        """Return the first command that should handle the message, if any."""
+
+        # Don't handle messages from bots
+        if message.author.bot:
+            return None
+
+        if isinstance(message.channel, discord.abc.PrivateChannel):
+            bucket = self._buckets.get(PRIVATE_CHANNELS)
+        else:
+            bucket = self._buckets.get(message.channel.id)
+
+        content = message.content.lower()
+        candidates = self._global.candidates(content)
+        if bucket is not None:
+            candidates.extend(bucket.candidates(content))
+            candidates.sort(key=lambda candidate: candidate[0])
+
+        evaluated = 0
+        found = None
+        for _, command in candidates:
+            evaluated += 1
+            command.stats.checks += 1
+            if await command.should_handle(message):
+                found = command
+                break
+
+        self.messages += 1
+        self.candidates += evaluated
+        self.candidates_per_message[evaluated] += 1
+        self.candidates_per_channel[message.channel.id] += evaluated
+
+        return found
+
+    def stats(self) -> dict:
+        """Return the candidate evaluation counters."""
+        return {
+            'commands': self._count,
+            'messages': self.messages,
+            'candidates': self.candidates,
+            'avg_candidates': self.candidates / self.messages if self.messages else 0,
+            'candidates_per_message': dict(self.candidates_per_message),
+            'candidates_per_channel': dict(self.candidates_per_channel),
+        }
+
+
+class ReactionDispatcher:
+    """
+    Find the reaction handler that should handle a reaction.
+
+    Handlers are indexed by the emojis they handle, and keep the priority
+    given by their registration order.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[BaseReactionHandler]] = defaultdict(list)
+
+    def add(self, handler: BaseReactionHandler) -> None:
+        for emoji_id in handler.emoji:
+            self._handlers[emoji_id].append(handler)
+
+    async def get_handler(self, reaction: discord.Reaction, user) -> Optional[BaseReactionHandler]:
+        """Return the first handler that should handle the reaction, if any."""
+        emoji = reaction.emoji
+        if isinstance(emoji, str):
+            emoji_id = emoji
+        elif not emoji.id:
+            emoji_id = emoji.name
+        else:
+            emoji_id = str(emoji.id)
+
+        for handler in self._handlers.get(emoji_id, []):
+            handler.stats.checks += 1
+            if await handler.should_handle(reaction, user):
+                return handler
+        return None
@@ -5,6 +5,8 @@ import discord
 import config
 from utils.discord import roles
 
+from .stats import HandlerStats
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,8 +26,14 @@ class BaseReactionHandler:
     channels = None
     roles = None
 
+    # Registration, see `Registry`
+    name = None
+    priority = 0
+    variants = None
+
     def __init__(self, client):
         self.client = client
+        self.stats = HandlerStats()
 
     async def should_handle(self, reaction, user):
         """Check if the command should handle the message."""
@@ -74,9 +82,10 @@ class BaseReactionHandler:
         of to the message's channel.
         """
         channel = self.get_response_channel(reaction, response_channel)
-        await self.pre_handle(reaction, user, channel)
-        response = await self.handle(reaction, user, channel)
-        await self.post_handle(reaction, user, channel, response)
+        with self.stats.measure():
+            await self.pre_handle(reaction, user, channel)
+            response = await self.handle(reaction, user, channel)
+            await self.post_handle(reaction, user, channel, response)
         return response
 
     def get_response_channel(self, reaction, response_channel):
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import importlib
+import logging
+from collections import defaultdict
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    """
+    Create the commands, reaction handlers and background tasks of the bot.
+
+    Each package declares its handlers in `HANDLERS`, which maps their class
+    names to their modules, and the ones that are disabled by default in
+    `DISABLED_BY_DEFAULT`. Modules are only imported for the handlers that
+    are enabled, so disabled handlers don't cost anything at startup.
+
+    Classes declare their `priority`, handlers with a higher priority are
+    tried first and ties keep the declaration order. A class with
+    `variants` is created once per variant, with the variant's keyword
+    arguments, and is named `<class name>:<variant>`.
+
+    The `enabled` and `disabled` names override the packages' defaults, so
+    that they can be changed per deployment. A variant's name takes
+    precedence over its class name.
+    """
+
+    def __init__(self, enabled: Iterable[str] = (), disabled: Iterable[str] = ()):
+        self.enabled = set(enabled)
+        self.disabled = set(disabled)
+        self.instances: dict[type, list] = defaultdict(list)
+
+    def create(self, client, package: str) -> list:
+        """Create the enabled handlers declared in the package, by priority."""
+        instances = []
+        for cls, default in sorted(self.discover(package), key=lambda item: -item[0].priority):
+            for name, kwargs in self.get_variants(cls):
+                if not self.is_enabled(name, cls.__name__, default):
+                    logger.info('Skipping disabled %s', name)
+                    continue
+                instance = cls(client, **kwargs)
+                instance.name = name
+                self.instances[cls].append(instance)
+                instances.append(instance)
+        return instances
+
+    def discover(self, package: str) -> list[tuple[type, bool]]:
+        """
+        Return the declared classes that may be enabled, and whether they're
+        enabled by default, importing only their modules.
+        """
+        module = importlib.import_module(package)
+        classes = []
+        for name, module_name in module.HANDLERS.items():
+            default = name not in module.DISABLED_BY_DEFAULT
+            if not self.may_be_enabled(name, default):
+                logger.info('Skipping disabled %s', name)
+                continue
+            submodule = importlib.import_module(module_name, package)
+            classes.append((getattr(submodule, name), default))
+        return classes
+
+    @staticmethod
+    def get_variants(cls: type) -> list[tuple[str, dict]]:
+        if not cls.variants:
+            return [(cls.__name__, {})]
+        return [(f'{cls.__name__}:{variant}', kwargs) for variant, kwargs in cls.variants.items()]
+
+    def is_enabled(self, name: str, class_name: str, default: bool) -> bool:
+        for key in (name, class_name):
+            if key in self.disabled:
+                return False
+            if key in self.enabled:
+                return True
+        return default
+
+    def may_be_enabled(self, class_name: str, default: bool) -> bool:
+        """Whether the class or any of its variants may be enabled."""
+        if any(name.startswith(f'{class_name}:') for name in self.enabled):
+            return True
+        return self.is_enabled(class_name, class_name, default)
+
+    def get(self, cls: type) -> list:
+        """Return the enabled instances of the class."""
+        return self.instances.get(cls, [])
+
+    def get_stats(self) -> dict[str, dict]:
+        return {
+            instance.name: instance.stats.as_dict()
+            for instances in self.instances.values()
+            for instance in instances
+            if hasattr(instance, 'stats')
+        }
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class HandlerStats:
+    """Cost of a command or reaction handler."""
+
+    checks: int = 0  # Times should_handle was called by the dispatcher
+    handled: int = 0
+    errors: int = 0
+    total_time: float = 0
+    max_time: float = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.handled if self.handled else 0
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.handled += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    def as_dict(self) -> dict:
+        return {
+            'checks': self.checks,
+            'handled': self.handled,
+            'errors': self.errors,
+            'avg_time': self.avg_time,
+            'max_time': self.max_time,
+        }
@@ -6,17 +6,18 @@ import re
 
 import discord
 from aioredis import Redis
-from openai.types.beta.threads import MessageContentText, MessageContentImageFile
-from aiohttp_requests import requests
 
 import config
 from commands.base import BaseCommand
 from helpers.chatter import Chatter
 import utils.redis
 import utils.urls
-from utils import emojis
+from utils import emojis, http
+from utils.lazy import lazy_import
 from utils.openai import describe_image
 
+threads = lazy_import('openai.types.beta.threads')
+
 REDIS_TRIGGER_FREQ_KEY = 'chatter_trigger_frequency'
 DEFAULT_TRIGGER_FREQ = 50
 
@@ -49,6 +50,7 @@ class ChatterCommand(BaseCommand):
     command = ''
     allow_pm = False
     channels = {config.DISCORD_LOUNGE_CHANNEL_ID}
+    priority = -1  # Handles every message in the lounge, so it goes last
 
     def __init__(self, client):
         super().__init__(client)
@@ -100,7 +102,7 @@ class ChatterCommand(BaseCommand):
         # Check which URLs are for valid images
         image_urls = []
         for url in urls:
-            response = await requests.session.head(url, allow_redirects=True)
+            response = await http.get_session().head(url, allow_redirects=True)
             if (
                 response.content_type in IMAGE_CONTENT_TYPES
                 and response.content_length <= IMAGE_MAX_SIZE
@@ -148,16 +150,16 @@ class ChatterCommand(BaseCommand):
         chatter_messages = await self.chatter.run()
         for chatter_message in chatter_messages:
             for message_content in chatter_message.content:
-                if isinstance(message_content, MessageContentText):
+                if isinstance(message_content, threads.MessageContentText):
                     await self._handle_text_message(response_channel, message_content)
-                elif isinstance(message_content, MessageContentImageFile):
+                elif isinstance(message_content, threads.MessageContentImageFile):
                     # This assistant shouldn't generate images
                     pass
 
     @staticmethod
     async def _handle_text_message(
         response_channel: discord.TextChannel,
-        message_content: MessageContentText,
+        message_content: threads.MessageContentText,
     ) -> None:
         text = message_content.text.value
         for emote_string, emote in AVAILABLE_EMOTES.items():
@@ -7,13 +7,13 @@ from typing import Optional
 
 import dateutil.parser
 import discord
-from aiohttp_requests import requests
 from dateutil.tz import tzutc
 
 import config
 from commands.base import BaseCommand
 from components.confimation import ConfirmationMessage
 from components.progress_bar import ProgressBarMessage
+from utils import http
 
 
 class CreateEvents(BaseCommand):
@@ -29,7 +29,7 @@ class CreateEvents(BaseCommand):
                 content=f'Wrong arguments. `{self.command} <url|json>`'
             )
         if argument.startswith('http'):
-            resp = await requests.session.get(argument)
+            resp = await http.get_session().get(argument)
             data = await resp.json()
         else:
             data = json.loads(argument)
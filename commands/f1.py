@@ -1,16 +1,15 @@
 import json
 from datetime import datetime
-from typing import Dict
+from typing import Optional
 
-import dateutil.parser
-import dateutil.utils
 import discord
-from aiohttp_requests import requests
 from dateutil.tz import tzutc
 
 import config
 from commands.base import BaseCommand
 from components.progress_bar import ProgressBarMessage
+from utils import f1, http
+from utils.f1 import Race
 
 SESSION_NAMES = {
     'fp1': 'FP1',
@@ -31,15 +30,16 @@ class F1CreateEventsCommand(BaseCommand):
         self, message: discord.Message, response_channel: discord.TextChannel
     ) -> discord.Message:
         arguments = message.content.split()[1:]
-        if len(arguments) != 2:
+        if len(arguments) not in (1, 2):
             return await response_channel.send(
-                f'Wrong arguments. `{self.command} <voice_channel_id> <data_url>`\n'
-                'Data from https://github.com/sportstimes/f1/tree/main/_db/f1',
+                f'Wrong arguments. `{self.command} <voice_channel_id> [data_url]`\n'
+                'Data from https://github.com/sportstimes/f1/tree/main/_db/f1, '
+                "defaults to the current season's schedule",
                 suppress_embeds=True,
             )
 
         voice_channel_id = int(arguments[0])
-        data_url = arguments[1]
+        data_url = arguments[1] if len(arguments) == 2 else None
 
         # Load channel
         guild = message.guild
@@ -47,14 +47,14 @@ class F1CreateEventsCommand(BaseCommand):
 
         # Load data
         try:
-            res = await requests.session.get(data_url)
-            res.raise_for_status()
-            data = json.loads(await res.text())
+            races = await self.load_races(data_url)
         except:
-            return await response_channel.send(content=f'Error loading data from `{data_url}`')
+            return await response_channel.send(
+                content=f'Error loading data from `{data_url or f1.SCHEDULE_URL}`'
+            )
 
         # Create progress bar
-        num_races = len(data['races'])
+        num_races = len(races)
         progress_bar = ProgressBarMessage(
             self.client,
             response_channel,
@@ -65,7 +65,7 @@ class F1CreateEventsCommand(BaseCommand):
 
         # Create events for each race
         count = 0
-        for race in data['races']:
+        for race in races:
             await self.handle_race(guild, voice_channel, race)
             count += 1
             await progress_bar.update(count, num_races, comment=f'{count}/{num_races}')
@@ -75,26 +75,36 @@ class F1CreateEventsCommand(BaseCommand):
 
         return await response_channel.send(content='Finished')
 
+    @staticmethod
+    async def load_races(data_url: Optional[str]) -> list[Race]:
+        if not data_url:
+            season = await f1.schedule.get_season()
+            return season.races
+
+        res = await http.get_session('github').get(data_url)
+        res.raise_for_status()
+        data = json.loads(await res.text())
+        return f1.parse_races(data)
+
     async def handle_race(
-        self, guild: discord.Guild, voice_channel: discord.VoiceChannel, race: Dict
+        self, guild: discord.Guild, voice_channel: discord.VoiceChannel, race: Race
     ) -> None:
-        race_name = race['name'].replace('Grand Prix', '').strip()
+        race_name = race.name.replace('Grand Prix', '').strip()
         race_name = f'{race_name} GP'
-        for session, timestamp in race['sessions'].items():
-            if session in IGNORED_SESSIONS:
+        for session in race.sessions:
+            if session.type_ in IGNORED_SESSIONS:
                 continue
-            session_name = f'{race_name} {SESSION_NAMES[session]}'
-            await self.handle_session(guild, voice_channel, session_name, timestamp)
+            session_name = f'{race_name} {SESSION_NAMES[session.type_]}'
+            await self.handle_session(guild, voice_channel, session_name, session.timestamp)
 
     @staticmethod
     async def handle_session(
         guild: discord.Guild,
         voice_channel: discord.VoiceChannel,
         session_name: str,
-        timestamp: str,
+        timestamp: datetime,
     ) -> None:
         event_name = f'F1 {session_name}'
-        timestamp = dateutil.parser.parse(timestamp)
 
         now = datetime.now(tzutc())
         if timestamp < now:
@@ -1,4 +1,5 @@
 import logging
+from io import BytesIO
 
 import discord
 
@@ -58,13 +59,13 @@ class BaseFinanceChartCommand(BaseCommand):
         await response_channel.trigger_typing()
 
         period = PERIOD_MAPPING[period]
-        chart = self.chart_class(ticker, period)
-        chart_image = await self.client.loop.create_task(chart.to_image())
+        chart_image = await finance_chart.get_chart_image(self.chart_class, ticker, period)
 
         if not chart_image:
             return await response_channel.send(f'No data found for ticker {ticker}')
 
-        return await response_channel.send(file=discord.File(fp=chart_image, filename='chart.png'))
+        chart_file = discord.File(fp=BytesIO(chart_image), filename='chart.png')
+        return await response_channel.send(file=chart_file)
 
 
 class FinanceLineChartCommand(BaseFinanceChartCommand):
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Optional
+
+import discord
+
+import config
+from commands.base import BaseCommand
+from utils import player_sessions, redis
+from utils.formatting import code_block
+from utils.squad import prettify_layer_name
+
+DEFAULT_PERIOD = '7d'
+PERIOD_DAYS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+MAX_DAYS = player_sessions.ROLLUP_TTL // (24 * 3600)
+TOP = 5
+
+
+class PlayerStatsCommand(BaseCommand):
+    """
+    Show the playtime of the tracked players, their most played layers and
+    who they play with, from the rollups of `SessionRecorder`.
+
+        !stats [player] [period]
+
+    The period is a number of days, weeks, months or years, like `7d` or
+    `1m`, or `all`. Days are UTC days, `1d` is today.
+    """
+
+    command = '!stats'
+    channels = {config.DISCORD_SQUAD_CHANNEL_ID, config.DISCORD_POSTSCRIPTUM_CHANNEL_ID}
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.redis = redis.get_client()
+
+    async def handle(
+        self, message: discord.Message, response_channel: discord.TextChannel
+    ) -> Optional[discord.Message]:
+        player = None
+        period = DEFAULT_PERIOD
+        players = {name.lower(): name for name in config.BM_PLAYERS.values()}
+        for argument in message.content.split()[1:]:
+            if parse_period(argument) is not False:
+                period = argument.lower()
+            elif argument.lower() in players:
+                player = players[argument.lower()]
+            else:
+                return await response_channel.send(
+                    f'Wrong arguments. `{self.command} [player] [period]`, '
+                    'the period is like `1d`, `7d`, `2w`, `1m`, `1y` or `all`'
+                )
+
+        rollup = await player_sessions.get_rollup(self.redis, parse_period(period))
+        title = f'last {period}' if period != 'all' else period
+        if player:
+            content = build_player_stats(rollup, player, title)
+        else:
+            content = build_stats(rollup, title)
+        return await response_channel.send(content=code_block(content))
+
+
+def parse_period(period: str):
+    """Return the days of the period, `None` for all time and `False` if it isn't a period."""
+    period = period.lower()
+    if period == 'all':
+        return None
+    match = re.fullmatch(r'(\d+)([dwmy])', period)
+    if not match:
+        return False
+    return max(min(int(match.group(1)) * PERIOD_DAYS[match.group(2)], MAX_DAYS), 1)
+
+
+def build_stats(rollup: player_sessions.Rollup, title: str) -> str:
+    if not rollup.playtime:
+        return f'No games {title}'
+
+    lines = [f'Playtime, {title}']
+    for player, seconds in rollup.playtime.most_common():
+        lines.append(f'{player:<12}{format_duration(seconds):>10}')
+
+    layers = sum(rollup.layers.values(), Counter())
+    lines += ['', 'Most played layers, player time']
+    for layer, seconds in layers.most_common(TOP):
+        lines.append(f'{prettify_layer_name(layer)[:40]:<40}{format_duration(seconds):>10}')
+    return '\n'.join(lines)
+
+
+def build_player_stats(rollup: player_sessions.Rollup, player: str, title: str) -> str:
+    playtime = rollup.playtime[player]
+    if not playtime:
+        return f'{player} has no games {title}'
+
+    lines = [f'{player}, {title}: {format_duration(playtime)}', '', 'Most played layers']
+    for layer, seconds in rollup.layers[player].most_common(TOP):
+        lines.append(
+            f'{prettify_layer_name(layer)[:40]:<40}'
+            f'{format_duration(seconds):>10}{seconds / playtime:>6.0%}'
+        )
+    lines += ['', 'Played with']
+    if not rollup.coplay[player]:
+        lines.append('Nobody')
+    for other, seconds in rollup.coplay[player].most_common(TOP):
+        lines.append(f'{other:<40}{format_duration(seconds):>10}{seconds / playtime:>6.0%}')
+    return '\n'.join(lines)
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f'{minutes}m'
+    return f'{minutes // 60}h {minutes % 60:02}m'
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import discord
+
+import config
+from commands.base import BaseCommand
+from utils.formatting import code_block
+
+
+class TaskStatsCommand(BaseCommand):
+    """Show the runs, failures and durations of the background tasks."""
+
+    command = '!tasks'
+    channels = {config.DISCORD_ADMIN_CHANNEL_ID}
+
+    async def handle(
+        self, message: discord.Message, response_channel: discord.TextChannel
+    ) -> Optional[discord.Message]:
+        return await response_channel.send(content=code_block(self.build_table()))
+
+    def build_table(self) -> str:
+        lines = [
+            f'{"task":<30}{"runs":>6}{"fail":>6}{"skip":>6}{"miss":>6}'
+            f'{"last":>8}{"p95":>8}  last run'
+        ]
+        for name, stats in sorted(self.client.scheduler.get_stats().items()):
+            last_run = stats['last_run'].strftime('%m-%d %H:%M') if stats['last_run'] else '-'
+            lines.append(
+                f'{name[:29]:<30}{stats["runs"]:>6}{stats["failures"]:>6}'
+                f'{stats["skipped"]:>6}{stats["missed"]:>6}'
+                f'{format_seconds(stats["last_duration"]):>8}'
+                f'{format_seconds(stats["p95_duration"]):>8}  {last_run}'
+            )
+        return '\n'.join(lines)
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '-'
+    return f'{seconds:.1f}s'
@@ -5,10 +5,12 @@ from io import BytesIO
 from typing import Optional
 
 import discord
-from aiohttp_requests import requests
-from openai import AsyncOpenAI
 
 from commands.base import BaseCommand
+from utils import http
+from utils.lazy import lazy_import
+
+openai = lazy_import('openai')
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +23,13 @@ class TtsCommand(BaseCommand):
 
     def __init__(self, client):
         super().__init__(client)
-        self.openai_client = AsyncOpenAI()
+        self._openai_client = None
+
+    @property
+    def openai_client(self) -> openai.AsyncOpenAI:
+        if self._openai_client is None:
+            self._openai_client = openai.AsyncOpenAI()
+        return self._openai_client
 
     async def handle(self, message, response_channel: discord.TextChannel):
         parts: list[str] = message.content.split()
@@ -104,6 +112,6 @@ class TtsCommand(BaseCommand):
 
     @staticmethod
     async def load_text(attachment: discord.Attachment) -> str:
-        res = await requests.session.get(attachment.url)
+        res = await http.get_session('discord').get(attachment.url)
         text = await res.text()
         return text
@@ -10,6 +10,7 @@ import config
 from background_tasks import bm_players
 from commands.base import BaseCommand
 from commands.mixins import DeletePreviousMixin
+from utils.battlemetrics import ServerSnapshot
 from utils.squad import prettify_layer_name
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,13 @@ logger = logging.getLogger(__name__)
 class WhoCommand(DeletePreviousMixin, BaseCommand):
     command = '!who'
     allow_pm = False
+    variants = {
+        'squad': {'game': 'squad', 'channel': config.DISCORD_SQUAD_CHANNEL_ID},
+        'postscriptum': {
+            'game': 'postscriptum',
+            'channel': config.DISCORD_POSTSCRIPTUM_CHANNEL_ID,
+        },
+    }
 
     def __init__(self, client: discord.Client, game: str, channel: str):
         super().__init__(client)
@@ -74,31 +82,29 @@ class WhoMessageBuilder:
     @classmethod
     def build(cls, game: str) -> str:
         return '\n'.join(
-            cls._build_server(server)
-            for server in bm_players.servers_data
-            if server['game'] == game
+            cls._build_server(server) for server in bm_players.servers_data if server.game == game
         )
 
     @classmethod
-    def _build_server(cls, server: dict) -> str:
-        emote = server['emote'] if server['emote'] else f":flag_{server['country']}:"
+    def _build_server(cls, server: ServerSnapshot) -> str:
+        emote = server.emote if server.emote else f":flag_{server.country}:"
         players = ''
-        if server['players'] / server['max_players'] < 0.6:
-            players = f"Players: {server['players']}/{server['max_players']} (+{server['queue']})\n"
-        next_layer_data = server['next_layer_data']
+        if server.players / server.max_players < 0.6:
+            players = f"Players: {server.players}/{server.max_players} (+{server.queue})\n"
+        next_layer_data = server.next_layer_data
         next_f1 = next_layer_data['team1']['faction'] if next_layer_data else ''
         next_f2 = next_layer_data['team2']['faction'] if next_layer_data else ''
         next_v1 = next_layer_data['team1']['vehicles'] if next_layer_data else ''
         next_v2 = next_layer_data['team2']['vehicles'] if next_layer_data else ''
-        server_name = server['name'].replace('discord.gg/', r'discord.gg\/')
+        server_name = server.name.replace('discord.gg/', r'discord.gg\/')
         message = (
             f"{emote}   **{server_name}**\n"
             f"```yaml\n"
-            f"Pepegas: {', '.join(server['pepegas'])}\n"
-            f"Layer:   {prettify_layer_name(server['layer'])}"
+            f"Pepegas: {', '.join(server.pepegas)}\n"
+            f"Layer:   {prettify_layer_name(server.layer)}"
         )
-        if server['next_layer']:
-            message += f"\nNext:    {prettify_layer_name(server['next_layer']) or '–'}"
+        if server.next_layer:
+            message += f"\nNext:    {prettify_layer_name(server.next_layer) or '–'}"
 
         message += f"\n{players}\n```"
         return message
@@ -30,6 +30,21 @@ DISCORD_HACKERNEWS_WEBHOOK_URL = env.require('DISCORD_HACKERNEWS_WEBHOOK_URL')
 CHATTER_ASSISTANT_ID = env.require('CHATTER_ASSISTANT_ID')
 CHATTER_THREAD_ID = env.require('CHATTER_THREAD_ID')
 
+# FastF1
+FASTF1_CACHE_DIR = env.get('FASTF1_CACHE_DIR', '.fastf1_cache')
+FASTF1_CACHE_MAX_SIZE = int(env.get('FASTF1_CACHE_MAX_SIZE', 1024 * 1024 * 1024))  # Bytes
+
+# Commands, reaction handlers and background tasks to enable or disable on top
+# of their defaults, comma separated class names, or `<class name>:<variant>`
+ENABLED_HANDLERS = env.get_list('ENABLED_HANDLERS')
+DISABLED_HANDLERS = env.get_list('DISABLED_HANDLERS')
+
+# Startup report, a JSON line is appended to it on every start
+STARTUP_REPORT_FILE = env.get('STARTUP_REPORT_FILE')
+
+# Finance charts
+FINANCE_CHART_RENDERER = env.get('FINANCE_CHART_RENDERER', 'plotly')  # plotly or matplotlib
+
 # BattleMetrics
 BM_TOKEN = env.require('BM_TOKEN')
 BM_PLAYERS = {
@@ -60,6 +75,12 @@ BM_ALLOWED_GAMES = {
 BM_SERVER_EMOTES = {
     '2272069': '<:bb:959392964243771413>',  # Blood Bound
 }
+# Servers queried on every poll, other players are looked up one by one
+BM_SERVERS = env.get_list('BM_SERVERS', ['2272069'])
+BM_CONCURRENCY = int(env.get('BM_CONCURRENCY', 4))
+# Query the servers directly with A2S between the BattleMetrics polls, 1 to enable
+BM_A2S = env.get('BM_A2S', '0') == '1'
+BM_A2S_TIMEOUT = float(env.get('BM_A2S_TIMEOUT', 1))
 
 
 def setup_logging():
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+from typing import TYPE_CHECKING
 
-import openai
-import openai.types.beta
-from openai.types.beta.threads import ThreadMessage
+if TYPE_CHECKING:
+    import openai
+    from openai.types.beta.threads import ThreadMessage
 
 
 class Chatter:
@@ -0,0 +1,35 @@
+import re
+import unittest
+
+from commands.base.dispatcher import _CommandIndex
+
+
+class FakeCommand:
+    command = None
+
+    def __init__(self, re_command: re.Pattern):
+        self.re_command = re_command
+
+
+class CommandIndexTest(unittest.TestCase):
+    def get_candidates(self, commands: list[FakeCommand], content: str) -> list[FakeCommand]:
+        index = _CommandIndex()
+        for order, command in enumerate(commands):
+            index.add(order, command)
+        return [command for _, command in index.candidates(content)]
+
+    def test_flags_are_scoped_to_their_pattern(self):
+        dotall = FakeCommand(re.compile(r'^!a.b', re.DOTALL))
+        other = FakeCommand(re.compile(r'^!c.d'))
+        self.assertEqual(self.get_candidates([dotall, other], '!a\nb'), [dotall, other])
+        self.assertEqual(self.get_candidates([dotall, other], '!c\nd'), [])
+
+    def test_same_group_names_are_searched_one_by_one(self):
+        first = FakeCommand(re.compile(r'^!first (?P<arg>\w+)'))
+        second = FakeCommand(re.compile(r'^!second (?P<arg>\w+)'))
+        self.assertEqual(self.get_candidates([first, second], '!second x'), [second])
+        self.assertEqual(self.get_candidates([first, second], '!third x'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
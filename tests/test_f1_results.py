@@ -0,0 +1,107 @@
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from background_tasks.f1 import F1Results
+
+
+def make_session(name: str, **results) -> SimpleNamespace:
+    data = {
+        'Abbreviation': ['VER', 'HAM'],
+        'TeamName': ['Red Bull Racing', 'Mercedes'],
+        'Position': [np.nan, np.nan],
+        'ClassifiedPosition': ['', ''],
+        'GridPosition': [np.nan, np.nan],
+        'Time': [pd.NaT, pd.NaT],
+        'Points': [np.nan, np.nan],
+        'Q1': [pd.NaT, pd.NaT],
+        'Q2': [pd.NaT, pd.NaT],
+        'Q3': [pd.NaT, pd.NaT],
+    }
+    data.update(results)
+    return SimpleNamespace(
+        name=name,
+        session_info={'Meeting': {'Name': 'Monaco Grand Prix'}},
+        results=pd.DataFrame(data, index=['1', '44']),
+    )
+
+
+class F1ResultsTest(unittest.TestCase):
+    def setUp(self):
+        self.task = F1Results(client=None)
+
+    def test_nan_positions_are_not_posted(self):
+        for name in ['Qualifying', 'Sprint Shootout', 'Sprint', 'Race']:
+            with self.subTest(name):
+                session = make_session(name)
+                self.assertFalse(self.task.has_positions(session))
+                message = self.task.build_message(session)
+                self.assertIn(f'Monaco GP {name} results', message)
+
+    def test_quali_results(self):
+        session = make_session(
+            'Qualifying',
+            Position=[1.0, np.nan],
+            Q1=[pd.Timedelta(seconds=72.5), pd.NaT],
+        )
+        self.assertTrue(self.task.has_positions(session))
+        lines = self.task.build_message(session).splitlines()
+        self.assertIn('` 1   VER   0:01:12.500', lines[1])
+        self.assertIn('`     HAM', lines[2])
+
+    def test_race_results(self):
+        session = make_session(
+            'Race',
+            Position=[1.0, 2.0],
+            ClassifiedPosition=['1', '2'],
+            GridPosition=[3.0, np.nan],
+            Time=[pd.Timedelta(hours=1, seconds=1.5), pd.Timedelta(seconds=2.25)],
+            Points=[25.0, 18.0],
+        )
+        lines = self.task.build_message(session).splitlines()
+        self.assertIn('▲ 2   VER', lines[1])
+        self.assertIn('  –   HAM', lines[2])
+
+
+class F1ResultsWorkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.task = F1Results(client=None)
+        self.start = datetime.datetime(2023, 5, 28, 13, tzinfo=datetime.timezone.utc)
+        self.session = SimpleNamespace(timestamp=self.start, type_='gp')
+        self.task.get_next_session = mock.AsyncMock(return_value=self.session)
+        self.task.post_results = mock.AsyncMock(return_value=False)
+
+    async def work(self, now: datetime.datetime) -> int:
+        with mock.patch('background_tasks.f1.utc_now', return_value=now):
+            await self.task.work()
+        return self.task.calculate_sleep_seconds()
+
+    async def test_waits_for_the_end_of_the_session(self):
+        self.assertEqual(await self.work(self.start + datetime.timedelta(hours=1)), 3601)
+        self.assertEqual(await self.work(self.start - datetime.timedelta(days=1)), 6 * 3600)
+        self.task.post_results.assert_not_awaited()
+
+    async def test_polls_with_an_increasing_interval(self):
+        end = self.start + datetime.timedelta(hours=2)
+        waits = [await self.work(end) for _ in range(6)]
+        self.assertEqual(waits, [60, 120, 240, 480, 600, 600])
+        self.assertEqual(self.task.post_results.await_count, 6)
+
+    async def test_stops_polling_after_the_results_or_the_window(self):
+        end = self.start + datetime.timedelta(hours=2)
+        self.task.post_results.return_value = True
+        self.assertEqual(await self.work(end), 0)
+        self.assertIn(self.start, self.task.polled_sessions)
+
+        self.task.polled_sessions.clear()
+        self.task.post_results.return_value = False
+        self.assertEqual(await self.work(end + datetime.timedelta(hours=3)), 0)
+        self.assertIn(self.start, self.task.polled_sessions)
+
+
+if __name__ == '__main__':
+    unittest.main()
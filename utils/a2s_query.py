@@ -0,0 +1,67 @@
+"""
+Query game servers directly with the Steam A2S protocol, see
+https://developer.valvesoftware.com/wiki/Server_queries
+
+Faster than going through BattleMetrics, but the servers only return the
+in-game names of the players, not their BattleMetrics ids.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from utils.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from utils.battlemetrics import ServerSnapshot
+
+a2s_async = lazy_import('a2s.a2s_async')
+a2s_info = lazy_import('a2s.info')
+a2s_players = lazy_import('a2s.players')
+
+DEFAULT_TIMEOUT = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class A2SResult:
+    server: ServerSnapshot
+    player_names: frozenset[str]
+
+
+async def query_server(server: ServerSnapshot, timeout: float = DEFAULT_TIMEOUT) -> A2SResult:
+    """
+    Return the server snapshot updated with its A2S player counts, and the
+    names of the players on it. Raises `asyncio.TimeoutError` if the server
+    takes more than `timeout` seconds to answer a packet.
+
+    The name and layer are kept from the snapshot, the A2S map name isn't
+    in the same format as the BattleMetrics layer, and comparing them would
+    look like a layer change.
+    """
+    address = (server.ip, server.port_query)
+    info, players = await asyncio.gather(
+        request(address, a2s_info.InfoProtocol, timeout),
+        request(address, a2s_players.PlayersProtocol, timeout),
+    )
+    server = dataclasses.replace(
+        server,
+        players=info.player_count,
+        max_players=info.max_players,
+    )
+    return A2SResult(server, frozenset(player.name for player in players if player.name))
+
+
+async def request(address: tuple[str, int], protocol, timeout: float):
+    """
+    Same as `a2s.ainfo` and `a2s.aplayers`, but the socket is closed when
+    the query fails or times out, python-a2s leaves it open until it's
+    garbage collected.
+    """
+    conn = await a2s_async.A2SStreamAsync.create(address, timeout)
+    try:
+        return await a2s_async.request_async_impl(conn, 'utf-8', protocol)
+    finally:
+        conn.close()
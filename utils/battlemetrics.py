@@ -1,19 +1,32 @@
+from __future__ import annotations
+
+import asyncio
 import json
 import logging
 import re
-from typing import Optional
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
 
 import dateutil.parser
 import dateutil.utils
 from aiohttp import ClientResponseError
-from aiohttp_requests import requests
 
 import config
+from utils import a2s_query, http
 from utils.caching import SingleFlightCache as cached
 from utils.datetime import datetime_isoformat
 
 BASE_URL = 'https://api.battlemetrics.com'
 
+# Seconds that results are served after they expire while they're refreshed
+STALE_TTL = 120
+
+# Servers whose info is fetched through a worker proxy instead of the API
+SERVER_PROXIES = {
+    '2272069': 'https://tarmo-player-api-access.bloodboundbb.workers.dev',
+}
+
 CURR_MAP_RE = re.compile(r'Current level is (?:.+?), layer is (?P<current_map>.*)$')
 NEXT_MAP_RE = re.compile(r'Next level is (?:.+?), layer is (?P<next_map>.*)$')
 AFK_SEED_RE = re.compile(r'\b(afk|seed(ing)?)\b', flags=re.IGNORECASE)
@@ -25,55 +38,99 @@ RCON_NO_CACHE_ALLOWED_COMMANDS = {
 logger = logging.getLogger(__name__)
 
 
-@cached(ttl=10)
-async def get_server_players(server_id: str, token: str):
+class BattlemetricsError(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class ServerSnapshot:
+    id: str
+    name: str
+    ip: str
+    port: int
+    port_query: int
+    country: str
+    emote: Optional[str]
+    game: str
+    players: int
+    max_players: int
+    layer: str
+    next_layer: Optional[str]
+    queue: int
+    # Set by BattlemetricsPlayersTask, the tracked players on the server
+    pepegas: tuple[str, ...] = ()
+    next_layer_data: Optional[dict] = field(default=None, compare=False)
+
+    @classmethod
+    def from_data(cls, server: dict) -> ServerSnapshot:
+        attrs = server['attributes']
+        details = attrs['details']
+        return cls(
+            id=server['id'],
+            name=attrs['name'],
+            ip=attrs['ip'],
+            port=attrs['port'],
+            port_query=attrs['portQuery'],
+            country=attrs['country'].lower(),
+            emote=config.BM_SERVER_EMOTES.get(server['id']),
+            game=server['relationships']['game']['data']['id'],
+            players=attrs['players'],
+            max_players=attrs['maxPlayers'],
+            layer=details['map'],
+            next_layer=details.get('squad_nextLayer'),
+            queue=details['squad_publicQueue'] + details['squad_reservedQueue'],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerSnapshot:
+    id: str
+    name: str
+    server: Optional[ServerSnapshot]
+
+
+@cached(ttl=10, stale_ttl=STALE_TTL)
+async def get_server_players(server_id: str, token: str) -> dict[str, PlayerSnapshot]:
+    """Return the tracked players on the server, all sharing the same server snapshot."""
     data = await get_server_info(server_id, token)
-    server = data['data']
-    server_attrs = server['attributes'] if server else None
-    server_details = server_attrs['details'] if server else None
+    if data is None:
+        raise BattlemetricsError(f'Server {server_id} info not available')
+    server = ServerSnapshot.from_data(data['data']) if data['data'] else None
     players = {}
-    for player_data in data['included']:
+    for player_data in data.get('included', []):
         player_id = player_data['id']
-        if player_id not in config.BM_PLAYERS:
+        if player_data.get('type', 'player') != 'player' or player_id not in config.BM_PLAYERS:
             continue
-        players[player_id] = {
-            'player': {
-                'id': player_id,
-                'name': player_data['attributes']['name'],
-            },
-            'server': {
-                'id': server['id'] if server else None,
-                'name': server['attributes']['name'] if server else None,
-                'ip': server_attrs['ip'] if server else None,
-                'port': server_attrs['port'] if server else None,
-                'port_query': server_attrs['portQuery'] if server else None,
-                'country': server_attrs['country'].lower() if server else None,
-                'emote': config.BM_SERVER_EMOTES.get(server['id']) if server else None,
-                'game': server['relationships']['game']['data']['id'] if server else None,
-                'players': server_attrs['players'] if server else None,
-                'max_players': server_attrs['maxPlayers'] if server else None,
-                'layer': server_details['map'] if server else None,
-                'next_layer': server_details.get('squad_nextLayer') if server else None,
-                'queue': (
-                    server_details['squad_publicQueue'] + server_details['squad_reservedQueue']
-                    if server
-                    else None
-                ),
-            },
-        }
+        players[player_id] = PlayerSnapshot(
+            id=player_id,
+            name=player_data['attributes']['name'],
+            server=server,
+        )
     return players
 
 
-@cached(ttl=10)
+async def get_server(server_id: str, token: str) -> Optional[ServerSnapshot]:
+    data = await get_server_info(server_id, token)
+    if data is None:
+        raise BattlemetricsError(f'Server {server_id} info not available')
+    return ServerSnapshot.from_data(data['data']) if data['data'] else None
+
+
+@cached(ttl=10, stale_ttl=STALE_TTL)
 async def get_server_info(server_id: str, token: str):
     logger.debug('Get server %s info', server_id)
     try:
-        res = await requests.session.request(
-            'GET',
-            'https://tarmo-player-api-access.bloodboundbb.workers.dev',
-            headers={'Authorization': token},
-        )
-        res.raise_for_status()
+        if server_id in SERVER_PROXIES:
+            res = await http.get_session('battlemetrics').request(
+                'GET',
+                SERVER_PROXIES[server_id],
+                headers={'Authorization': token},
+            )
+            res.raise_for_status()
+        else:
+            res = await _send_request(
+                f'/servers/{server_id}', token=token, params={'include': 'player'}
+            )
     except ClientResponseError:
         logger.error('Error getting server %s info', server_id)
         return None
@@ -82,8 +139,8 @@ async def get_server_info(server_id: str, token: str):
     return data
 
 
-@cached(ttl=10)
-async def get_player_server(player_id: str, token: str) -> Optional[dict]:
+@cached(ttl=10, stale_ttl=STALE_TTL)
+async def get_player_server(player_id: str, token: str) -> Optional[PlayerSnapshot]:
     logger.debug('Get current server for player %s', player_id)
     endpoint = f'/players/{player_id}'
     params = {
@@ -108,32 +165,170 @@ async def get_player_server(player_id: str, token: str) -> Optional[dict]:
         server = None
 
     data_attrs = data['data']['attributes']
-    server_attrs = server['attributes'] if server else None
-    server_details = server_attrs['details'] if server else None
-    return {
-        'player': {
-            'id': data_attrs['id'],
-            'name': data_attrs['name'],
-        },
-        'server': {
-            'id': server['id'] if server else None,
-            'name': server['attributes']['name'] if server else None,
-            'ip': server_attrs['ip'] if server else None,
-            'port': server_attrs['port'] if server else None,
-            'port_query': server_attrs['portQuery'] if server else None,
-            'country': server_attrs['country'].lower() if server else None,
-            'emote': config.BM_SERVER_EMOTES.get(server['id']) if server else None,
-            'game': server['relationships']['game']['data']['id'] if server else None,
-            'players': server_attrs['players'] if server else None,
-            'max_players': server_attrs['maxPlayers'] if server else None,
-            'layer': server_details['map'] if server else None,
-            'queue': (
-                server_details['squad_publicQueue'] + server_details['squad_reservedQueue']
-                if server
-                else None
+    return PlayerSnapshot(
+        id=data_attrs['id'],
+        name=data_attrs['name'],
+        server=ServerSnapshot.from_data(server) if server else None,
+    )
+
+
+class PlayerTracker:
+    """
+    Find on which server each tracked player is.
+
+    The known servers, `server_ids` and the last server each player was
+    seen on, are queried concurrently, at most `concurrency` at a time, and
+    each query returns all the tracked players on the server. Players that
+    aren't on any of them are looked up one by one, at most every
+    `lookup_interval` seconds per player. The servers found like this are
+    queried directly on the next polls.
+
+    If a server can't be queried, its players keep their last snapshot.
+
+    With an `a2s_timeout`, the servers are only polled through BattleMetrics
+    every `bm_interval` seconds. The polls in between query the servers
+    known from the last BattleMetrics poll directly with A2S, and the
+    tracked players are matched by their last BattleMetrics name on the
+    server they were last seen on. Players that join or change servers in
+    between are only found on the next BattleMetrics poll. A2S only updates
+    the player lists and counts, the layers are the BattleMetrics ones.
+    """
+
+    def __init__(
+        self,
+        server_ids: Iterable[str],
+        player_ids: Iterable[str],
+        token: str,
+        concurrency: int = 4,
+        lookup_interval: int = 300,
+        a2s_timeout: Optional[float] = None,
+        bm_interval: int = 20,
+    ):
+        self.server_ids = set(server_ids)
+        self.player_ids = set(player_ids)
+        self.token = token
+        self.concurrency = concurrency
+        self.lookup_interval = lookup_interval
+        self.a2s_timeout = a2s_timeout
+        self.bm_interval = bm_interval
+        self.bm_polled: Optional[float] = None  # time.monotonic() of the last BattleMetrics poll
+        self.servers: dict[str, ServerSnapshot] = {}  # Server id: snapshot
+        self.names: dict[str, str] = {}  # Player id: last BattleMetrics name
+        self.last_servers: dict[str, str] = {}  # Player id: server id
+        self.last_lookups: dict[str, float] = {}  # Player id: time.monotonic()
+        self.players: dict[str, Optional[PlayerSnapshot]] = {}
+
+    async def get_players(self) -> dict[str, Optional[PlayerSnapshot]]:
+        """Return the snapshot of every tracked player by id, `None` if offline."""
+        if (
+            self.a2s_timeout is None
+            or self.bm_polled is None
+            or time.monotonic() - self.bm_polled >= self.bm_interval
+        ):
+            return await self.get_players_bm()
+        return await self.get_players_a2s()
+
+    async def get_players_bm(self) -> dict[str, Optional[PlayerSnapshot]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        server_ids = sorted(self.server_ids | set(self.last_servers.values()))
+        servers: dict[str, ServerSnapshot] = {}
+
+        async def get_server_players_(server_id: str) -> Optional[dict[str, PlayerSnapshot]]:
+            async with semaphore:
+                try:
+                    server_players = await get_server_players(server_id, self.token)
+                    # Cached by get_server_players
+                    server = await get_server(server_id, self.token)
+                    if server:
+                        servers[server_id] = server
+                    return server_players
+                except Exception:
+                    logger.exception('Error getting the players of server %s', server_id)
+                    return None
+
+        results = await asyncio.gather(*(get_server_players_(id_) for id_ in server_ids))
+        failed_servers = set()
+        players: dict[str, Optional[PlayerSnapshot]] = {}
+        for server_id, server_players in zip(server_ids, results):
+            if server_players is None:
+                failed_servers.add(server_id)
+                continue
+            for player_id, player in server_players.items():
+                if player_id in self.player_ids and player.server:
+                    players[player_id] = player
+
+        # Players last seen on a server that couldn't be queried keep their snapshot
+        for player_id, server_id in self.last_servers.items():
+            if server_id in failed_servers and player_id not in players:
+                players[player_id] = self.players.get(player_id)
+
+        now = time.monotonic()
+        lookup_ids = [
+            player_id
+            for player_id in sorted(self.player_ids - players.keys())
+            if now - self.last_lookups.get(player_id, -self.lookup_interval) >= self.lookup_interval
+        ]
+
+        async def get_player_server_(player_id: str) -> Optional[PlayerSnapshot]:
+            async with semaphore:
+                self.last_lookups[player_id] = now
+                try:
+                    return await get_player_server(player_id, self.token)
+                except Exception:
+                    logger.exception('Error getting the server of player %s', player_id)
+                    return None
+
+        lookups = await asyncio.gather(*(get_player_server_(id_) for id_ in lookup_ids))
+        for player_id, player in zip(lookup_ids, lookups):
+            if player and player.server:
+                players[player_id] = player
+                servers.setdefault(player.server.id, player.server)
+
+        self.bm_polled = time.monotonic()
+        self.servers = servers
+        for player_id, player in players.items():
+            if player:
+                self.names[player_id] = player.name
+        return self.set_players(players)
+
+    async def get_players_a2s(self) -> dict[str, Optional[PlayerSnapshot]]:
+        server_ids = sorted(self.servers)
+        results = await asyncio.gather(
+            *(
+                a2s_query.query_server(self.servers[server_id], self.a2s_timeout)
+                for server_id in server_ids
             ),
-        },
-    }
+            return_exceptions=True,
+        )
+        players = dict(self.players)
+        for server_id, result in zip(server_ids, results):
+            if isinstance(result, BaseException):
+                # Its players keep their last snapshot until the next BattleMetrics poll
+                logger.warning('Error querying server %s with A2S: %r', server_id, result)
+                continue
+            server = result.server
+            self.servers[server_id] = server
+            for player_id in self.player_ids:
+                player = players.get(player_id)
+                if not (player and player.server and player.server.id == server_id):
+                    continue
+                if self.names.get(player_id) in result.player_names:
+                    players[player_id] = PlayerSnapshot(player_id, self.names[player_id], server)
+                else:
+                    players[player_id] = None
+        return self.set_players(players)
+
+    def set_players(
+        self, players: dict[str, Optional[PlayerSnapshot]]
+    ) -> dict[str, Optional[PlayerSnapshot]]:
+        for player_id in self.player_ids:
+            player = players.get(player_id)
+            if player and player.server:
+                self.last_servers[player_id] = player.server.id
+            else:
+                self.last_servers.pop(player_id, None)
+        self.players = {player_id: players.get(player_id) for player_id in self.player_ids}
+        return self.players
 
 
 async def _send_request(endpoint, method='GET', token=None, params=None, json_=None):
@@ -150,6 +345,8 @@ async def _send_request(endpoint, method='GET', token=None, params=None, json_=N
 
     logger.debug('Sending request %s %s | JSON: %s | Headers: %s', method, url, json_, headers)
 
-    res = await requests.session.request(method, url, params=params, json=json_, headers=headers)
+    res = await http.get_session('battlemetrics').request(
+        method, url, params=params, json=json_, headers=headers
+    )
     res.raise_for_status()
     return res
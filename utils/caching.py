@@ -1,84 +1,169 @@
 import asyncio
-from asyncio import sleep
+import time
+import weakref
+from collections import Counter, OrderedDict
+from functools import partial
+from typing import Any, Hashable, Optional
 
 from aiocache import cached as base_cached
 
+CACHE_STATS: dict[str, Counter] = {}
+
 
 class SingleFlightCache(base_cached):
     """
-    Subclass of `aiocache.cached` that caches a `CoroutinePromise` before the
-    decorated function is called. This way multiple calls to the decorated
-    function will all wait for the cached promise's result from the first call.
+    Subclass of `aiocache.cached` that caches an `asyncio.Future` for the
+    result before the decorated function is called. This way multiple calls
+    to the decorated function will all await the cached future from the first
+    call.
 
     This prevents a long running function from being called multiple times
     before it finishes and the result is cached.
+
+    Cache lookups are serialized per key, so calls with different arguments,
+    and different decorated functions, don't wait for each other. Failed
+    calls, i.e. calls that raise or return `None`, are evicted from the cache
+    as soon as they finish, so the next call retries instead of getting the
+    failure for the whole TTL.
+
+    If `stale_ttl` is given, the last good result is kept for `stale_ttl`
+    seconds after it expires. During that time callers get it immediately
+    while a single call refreshes it in the background, and they keep
+    getting it if the refresh fails.
+
+    The hits, misses, stale results served and failed calls are counted in
+    `stats`, which is also available as the `stats` attribute of the
+    decorated function and in `CACHE_STATS`.
     """
 
-    lock = asyncio.Lock()
+    def __init__(self, *args, stale_ttl=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stale_ttl = stale_ttl
+        self.locks = weakref.WeakValueDictionary()
+        self.last_results = {}
+        self.stats = Counter(hits=0, misses=0, stale=0, failures=0)
+
+    def __call__(self, f):
+        wrapper = super().__call__(f)
+        wrapper.stats = self.stats
+        CACHE_STATS[f'{f.__module__}.{f.__qualname__}'] = self.stats
+        return wrapper
 
     async def decorator(self, f, *args, cache_read=True, cache_write=True, **kwargs):
-        async with self.lock:
-            promise = None
-            key = self.get_cache_key(f, args, kwargs)
+        key = self.get_cache_key(f, args, kwargs)
+
+        async with self.get_lock(key):
+            future = None
 
             if cache_read:
-                # Check if a promise already exists in the cache
-                promise = await self.get_from_cache(key)
+                # Check if a future already exists in the cache
+                future = await self.get_from_cache(key)
 
-            cache_hit = promise is not None
-            if not cache_hit:
-                # Create promise if there wasn't a cache hit
-                promise = CoroutinePromise()
+            if future is None:
+                # Call the function if there wasn't a cache hit
+                self.stats['misses'] += 1
+                future = asyncio.ensure_future(f(*args, **kwargs))
                 if cache_write:
-                    await self.set_in_cache(key, promise)
-                promise.set_coroutine(f(*args, **kwargs))
-
-        return await promise.get_result()
-
-
-class CoroutinePromise:
+                    await self.set_in_cache(key, future)
+                    future.add_done_callback(partial(self.on_done, key))
+            else:
+                self.stats['hits'] += 1
+
+        stale_result = self.get_stale_result(key) if cache_read else None
+        if stale_result is not None and not future.done():
+            # Don't wait for the refresh if there's a stale result
+            self.stats['stale'] += 1
+            return stale_result
+
+        try:
+            # Shield the future so that a cancelled caller doesn't cancel the
+            # call for every other caller waiting for it.
+            result = await asyncio.shield(future)
+        except Exception:
+            if stale_result is None:
+                raise
+            result = None
+
+        if result is None and stale_result is not None:
+            self.stats['stale'] += 1
+            return stale_result
+
+        return result
+
+    def get_lock(self, key) -> asyncio.Lock:
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[key] = lock
+        return lock
+
+    def get_stale_result(self, key):
+        if self.stale_ttl is None or key not in self.last_results:
+            return None
+        result, timestamp = self.last_results[key]
+        ttl = self.ttl if isinstance(self.ttl, (int, float)) else 0
+        if time.monotonic() - timestamp > ttl + self.stale_ttl:
+            del self.last_results[key]
+            return None
+        return result
+
+    def on_done(self, key, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            self.stats['failures'] += 1
+            asyncio.ensure_future(self.evict(key, future))
+        elif self.stale_ttl is not None:
+            self.last_results[key] = (future.result(), time.monotonic())
+
+    async def evict(self, key, future: asyncio.Future) -> None:
+        async with self.get_lock(key):
+            # Don't evict a newer call that was cached after this one expired
+            if await self.get_from_cache(key) is future:
+                await self.cache.delete(key)
+
+
+class SizedTTLCache:
     """
-    Helper class that can await the result of a coroutine multiple times.
+    In-memory cache with a TTL per entry, bounded by the total size of its
+    values instead of their number. The least recently used entries are
+    evicted when adding an entry would go over `max_size`.
 
-    The coroutine doesn't have to be given before the result is awaited for: if
-    `get_result()` is called before `set_coroutine()` it will await until
-    `set_coroutine()` is called.
+    The size of each value is given by the caller, in bytes. Hits, misses and
+    evictions are counted in `stats`, which is registered in `CACHE_STATS`
+    under `name`.
     """
 
-    def __init__(self, sleep_time=0.1):
-        self.sleep_time = sleep_time
-
-        self.coroutine = None
-        self.result = None
-        self.exception = None
-
-        self.coroutine_set = False
-        self.awaited = False
-        self.got_result = False
-
-    def set_coroutine(self, coroutine):
-        self.coroutine = coroutine
-        self.coroutine_set = True
-
-    async def get_result(self):
-        while not self.coroutine_set:
-            # Wait until the coroutine is set
-            await sleep(self.sleep_time)
-
-        if not self.awaited:
-            # Await the coroutine
-            self.awaited = True
-            try:
-                self.result = await self.coroutine
-            except Exception as exc:
-                self.exception = exc
-            self.got_result = True
-
-        while not self.got_result:
-            # Wait until the await has returned the result
-            await sleep(self.sleep_time)
-
-        if self.exception:
-            raise self.exception
-        else:
-            return self.result
+    def __init__(self, name: str, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.entries: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self.stats = Counter(hits=0, misses=0, evictions=0)
+        CACHE_STATS[name] = self.stats
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        value, _, expires_at = entry
+        if time.monotonic() > expires_at:
+            self.delete(key)
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: int) -> None:
+        self.delete(key)
+        if size > self.max_size:
+            return
+        while self.entries and self.size + size > self.max_size:
+            self.delete(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+        self.entries[key] = (value, size, time.monotonic() + ttl)
+        self.size += size
+
+    def delete(self, key: Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterable, Optional
+
+import discord
+from discord.state import ConnectionState
+
+
+class MessageCache(deque):
+    """
+    Bounded deque of messages that also keeps an index by message id.
+
+    The index is kept in sync on every insert, removal and on the evictions
+    done by the deque when it's full, so looking up a message by id doesn't
+    need to scan the whole deque.
+    """
+
+    def __init__(self, iterable: Iterable[discord.Message] = (), maxlen: Optional[int] = None):
+        super().__init__(maxlen=maxlen)
+        self._index: dict[int, discord.Message] = {}
+        self.extend(iterable)
+
+    def get(self, message_id: int) -> Optional[discord.Message]:
+        return self._index.get(message_id)
+
+    def __contains__(self, message: object) -> bool:
+        return getattr(message, 'id', None) in self._index
+
+    def append(self, message: discord.Message) -> None:
+        if self.maxlen is not None and len(self) == self.maxlen:
+            self._unindex(self[0])
+        super().append(message)
+        self._index[message.id] = message
+
+    def appendleft(self, message: discord.Message) -> None:
+        if self.maxlen is not None and len(self) == self.maxlen:
+            self._unindex(self[-1])
+        super().appendleft(message)
+        self._index.setdefault(message.id, message)
+
+    def extend(self, messages: Iterable[discord.Message]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def extendleft(self, messages: Iterable[discord.Message]) -> None:
+        for message in messages:
+            self.appendleft(message)
+
+    def pop(self) -> discord.Message:
+        message = super().pop()
+        self._unindex(message)
+        return message
+
+    def popleft(self) -> discord.Message:
+        message = super().popleft()
+        self._unindex(message)
+        return message
+
+    def remove(self, message: discord.Message) -> None:
+        super().remove(message)
+        self._unindex(message)
+
+    def clear(self) -> None:
+        super().clear()
+        self._index.clear()
+
+    def _unindex(self, message: discord.Message) -> None:
+        # Only drop the entry if it points to this very message, a newer copy
+        # of the same message may have been appended after it.
+        if self._index.get(message.id) is message:
+            del self._index[message.id]
+
+
+class CachedConnectionState(ConnectionState):
+    """
+    Connection state that stores the messages in a `MessageCache`.
+
+    discord.py replaces the messages deque on READY and on guild removals, so
+    every assignment is wrapped in a `MessageCache`.
+    """
+
+    @property
+    def _messages(self) -> Optional[MessageCache]:
+        return self.__dict__.get('_messages')
+
+    @_messages.setter
+    def _messages(self, messages: Optional[Iterable[discord.Message]]) -> None:
+        if messages is not None and not isinstance(messages, MessageCache):
+            messages = MessageCache(messages, maxlen=self.max_messages)
+        self.__dict__['_messages'] = messages
+
+    def _get_message(self, msg_id: Optional[int]) -> Optional[discord.Message]:
+        return self._messages.get(msg_id) if self._messages else None
@@ -6,6 +6,14 @@ def get(name, default=None):
     return value
 
 
+def get_list(name, default=None):
+    """Return the comma separated values of the variable."""
+    value = get(name)
+    if value is None:
+        return default or []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
 def require(name):
     value = get(name)
     if value is None:
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Pool:
+    workers: int
+    processes: bool = False
+    initializer: Optional[Callable] = None
+
+
+POOLS = {
+    # Blocking I/O: FastF1 requests, cache maintenance, yfinance downloads
+    'io': Pool(workers=8),
+    # CPU-bound work that would hold the GIL, like parsing pages
+    'cpu': Pool(workers=2, processes=True),
+    # Finance charts, one long-lived process that keeps the renderer loaded
+    # between charts, see `utils.finance_chart`
+    'charts': Pool(workers=1, processes=True),
+}
+
+
+@dataclass
+class PoolStats:
+    workers: int
+    tasks: int = 0
+    errors: int = 0
+    total_time: float = 0
+    max_time: float = 0
+    total_run_time: float = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    max_queued: int = 0
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.tasks if self.tasks else 0
+
+    @property
+    def avg_run_time(self) -> float:
+        return self.total_run_time / self.tasks if self.tasks else 0
+
+    def as_dict(self) -> dict:
+        return {
+            'tasks': self.tasks,
+            'errors': self.errors,
+            'avg_time': self.avg_time,
+            'max_time': self.max_time,
+            'avg_run_time': self.avg_run_time,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+        }
+
+
+def _timed_call(func: Callable, *args, **kwargs) -> tuple[Any, float]:
+    # Runs in the worker, so the run time doesn't include the time queued
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class Executors:
+    """
+    Bounded executors for the blocking work of the bot, one per pool in
+    `POOLS`, so that it doesn't compete with discord.py for the loop's
+    default executor.
+
+    Process pools use the spawn start method, forking the running bot isn't
+    safe. Executors that break, e.g. because a worker process died, are
+    recreated on the next call. Queue depth and the time from submission to result (`time`) and
+    in the worker (`run_time`) are tracked per pool.
+    """
+
+    def __init__(self, pools: dict[str, Pool]):
+        self.pools = pools
+        self.executors: dict[str, Executor] = {}
+        self.stats = {name: PoolStats(workers=pool.workers) for name, pool in pools.items()}
+
+    def get_executor(self, name: str) -> Executor:
+        executor = self.executors.get(name)
+        if executor is None:
+            executor = self._create_executor(name)
+            self.executors[name] = executor
+        return executor
+
+    async def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        stats = self.stats[name]
+        call = partial(_timed_call, func, *args, **kwargs)
+
+        start = loop.time()
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        executor = self.get_executor(name)
+        try:
+            result, run_time = await loop.run_in_executor(executor, call)
+        except BrokenExecutor:
+            # A worker died, or its initializer failed. The next call gets a new executor.
+            stats.errors += 1
+            if self.executors.get(name) is executor:
+                logger.error('The %s executor is broken, it will be recreated', name)
+                del self.executors[name]
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+        elapsed = loop.time() - start
+        stats.tasks += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.total_run_time += run_time
+        return result
+
+    def shutdown(self) -> None:
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.executors.clear()
+
+    def get_stats(self) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def _create_executor(self, name: str) -> Executor:
+        pool = self.pools[name]
+        if pool.processes:
+            return ProcessPoolExecutor(
+                max_workers=pool.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=pool.initializer,
+            )
+        return ThreadPoolExecutor(
+            max_workers=pool.workers,
+            thread_name_prefix=f'executor-{name}',
+            initializer=pool.initializer,
+        )
+
+
+executors = Executors(POOLS)
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking I/O in the I/O thread pool."""
+    return await executors.run('io', func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run CPU-bound work in the worker processes. The function, its arguments
+    and its result must be picklable.
+    """
+    return await executors.run('cpu', func, *args, **kwargs)
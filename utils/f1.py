@@ -1,14 +1,302 @@
+from __future__ import annotations
+
+import asyncio
 import datetime
-from typing import Optional
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+import dateutil.parser
+
+import config
+from utils import http, redis
+from utils.datetime import to_epoch, utc_now
+from utils.executors import run_io
+from utils.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from fastf1.events import Event
+
+fastf1 = lazy_import('fastf1')
+
+SCHEDULE_URL = 'https://raw.githubusercontent.com/sportstimes/f1/main/_db/f1/{}.json'
+SCHEDULE_REDIS_KEY = 'f1_schedule:{}'
+SCHEDULE_TTL = 3600  # Seconds before a loaded schedule is revalidated
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Session:
+    type_: str
+    timestamp: datetime.datetime
+
+    @property
+    def week(self) -> int:
+        return self.timestamp.isocalendar()[1]
+
+    @property
+    def iso_timestamp(self) -> int:
+        return to_epoch(self.timestamp)
+
+
+@dataclass
+class Race:
+    name: str
+    sessions: list[Session]
+
+    @property
+    def week(self) -> int:
+        return self.sessions[0].week
+
+
+def parse_races(data: dict) -> list[Race]:
+    return [parse_race(race) for race in data['races']]
+
+
+def parse_race(race_dict: dict) -> Race:
+    sessions = [parse_session(*session) for session in race_dict['sessions'].items()]
+    return Race(
+        name=race_dict['name'],
+        sessions=sessions,
+    )
+
+
+def parse_session(session_type: str, timestamp: str) -> Session:
+    return Session(
+        type_=session_type,
+        timestamp=dateutil.parser.parse(timestamp),
+    )
+
+
+class Season:
+    """Races of a season, indexed by ISO week and by date."""
+
+    def __init__(self, races: list[Race]):
+        self.races = races
+        self.races_by_week: dict[tuple[int, int], Race] = {}
+        self.sessions_by_date: dict[datetime.date, tuple[Race, list[Session]]] = {}
+        for race in races:
+            if not race.sessions:
+                continue
+            iso_year, iso_week, _ = race.sessions[0].timestamp.isocalendar()
+            self.races_by_week.setdefault((iso_year, iso_week), race)
+            for session in race.sessions:
+                date = session.timestamp.date()
+                self.sessions_by_date.setdefault(date, (race, []))[1].append(session)
+
+    def get_week_race(self, date: datetime.date) -> Optional[Race]:
+        iso_year, iso_week, _ = date.isocalendar()
+        return self.races_by_week.get((iso_year, iso_week))
+
+    def get_day_sessions(self, date: datetime.date) -> tuple[Optional[Race], list[Session]]:
+        return self.sessions_by_date.get(date, (None, []))
+
+
+class Schedule:
+    """
+    Season schedules from SCHEDULE_URL.
+
+    Parsed seasons are kept in memory and the raw data in redis, so a restart
+    doesn't need to download them again. After SCHEDULE_TTL seconds a season
+    is revalidated with its ETag, and only parsed again if it changed.
+    """
+
+    def __init__(self):
+        self.redis = redis.get_client()
+        self.seasons: dict[int, Season] = {}
+        self.etags: dict[int, Optional[str]] = {}
+        self.checked_at: dict[int, float] = {}
+        self.locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def get_season(self, year: Optional[int] = None) -> Season:
+        year = year or utc_now().year
+        async with self.locks[year]:
+            checked_at = self.checked_at.get(year)
+            if checked_at is None or time.monotonic() - checked_at > SCHEDULE_TTL:
+                await self._load_season(year)
+        return self.seasons[year]
 
-import fastf1
-from fastf1.core import Session
-from fastf1.events import Event
+    async def _load_season(self, year: int) -> None:
+        if year not in self.seasons:
+            await self._load_from_redis(year)
 
-from utils.datetime import utc_now
+        try:
+            await self._fetch_season(year)
+        except Exception:
+            if year not in self.seasons:
+                raise
+            logger.exception('Error revalidating the %d F1 schedule, using the cached one', year)
+        self.checked_at[year] = time.monotonic()
 
+    async def _fetch_season(self, year: int) -> None:
+        headers = {}
+        if year in self.seasons and self.etags.get(year):
+            headers['If-None-Match'] = self.etags[year]
 
-async def get_latest_session(client) -> Optional[Session]:
+        res = await http.get_session('github').get(SCHEDULE_URL.format(year), headers=headers)
+        if res.status == 304 and year in self.seasons:
+            res.release()
+            return
+        res.raise_for_status()
+        data = json.loads(await res.text())
+        etag = res.headers.get('ETag')
+
+        self.seasons[year] = Season(parse_races(data))
+        self.etags[year] = etag
+        value = json.dumps({'etag': etag, 'data': data})
+        await self.redis.set(SCHEDULE_REDIS_KEY.format(year), value)
+
+    async def _load_from_redis(self, year: int) -> None:
+        value = await self.redis.get(SCHEDULE_REDIS_KEY.format(year))
+        if not value:
+            return
+        value = json.loads(value.decode())
+        self.seasons[year] = Season(parse_races(value['data']))
+        self.etags[year] = value['etag']
+
+
+schedule = Schedule()
+
+
+class FastF1Cache:
+    """
+    On-disk cache for FastF1, bounded to `max_size` bytes.
+
+    FastF1 stores its parsed API data in a directory per season, next to a
+    sqlite database with the raw HTTP responses. When the cache grows over
+    `max_size`, expired HTTP responses are dropped first and then whole
+    seasons, least recently used first. The current season is never evicted.
+
+    Hits and misses of the HTTP cache are counted in `stats`, as
+    `http_hits` and `http_misses`. They don't include FastF1's own cache of
+    parsed API data, which is checked first.
+
+    The HTTP cache is FastF1's private requests-cache session, see the
+    versions pinned in requirements.txt. If it isn't found, the HTTP stats
+    and the eviction of expired responses are skipped.
+
+    FastF1 is imported lazily, the cache is enabled before its first use.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size = max_size
+        self.enabled = False
+        self.stats = Counter(http_hits=0, http_misses=0, evicted_seasons=0)
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        with self._lock:
+            if self.enabled:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fastf1.Cache.enable_cache(self.cache_dir)
+            http_session = self._get_http_session()
+            if http_session is None:
+                logger.warning('FastF1 HTTP cache not found, its stats are disabled')
+            else:
+                self._track_requests(http_session)
+            self.enabled = True
+        self.evict()
+
+    def evict(self) -> None:
+        """Evict the least recently used seasons until the cache fits."""
+        if self._get_size(self.cache_dir) <= self.max_size:
+            return
+
+        http_session = self._get_http_session()
+        if http_session is not None:
+            try:
+                http_session.cache.delete(expired=True)
+            except TypeError:
+                # requests-cache < 1.0
+                logger.warning('Cannot delete the expired FastF1 HTTP responses')
+
+        current_year = str(utc_now().year)
+        seasons = sorted(
+            (self._get_last_used(path), path)
+            for path in self._get_season_dirs()
+            if os.path.basename(path) != current_year
+        )
+        size = self._get_size(self.cache_dir)
+        for _, path in seasons:
+            if size <= self.max_size:
+                break
+            season_size = self._get_size(path)
+            logger.info('Evicting FastF1 cache for %s', os.path.basename(path))
+            shutil.rmtree(path, ignore_errors=True)
+            size -= season_size
+            self.stats['evicted_seasons'] += 1
+
+    def warm_up(self) -> None:
+        """Load the current season's event schedule into the cache."""
+        self.enable()
+        fastf1.get_event_schedule(utc_now().year)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'size': self._get_size(self.cache_dir) if self.enabled else 0,
+            'max_size': self.max_size,
+        }
+
+    @staticmethod
+    def _get_http_session():
+        session = getattr(fastf1.Cache, '_requests_session_cached', None)
+        if session is None or not hasattr(session, 'cache') or not hasattr(session, 'send'):
+            return None
+        return session
+
+    def _track_requests(self, session) -> None:
+        if getattr(session, '_tracked', False):
+            return
+        send = session.send
+
+        def tracked_send(*args, **kwargs):
+            response = send(*args, **kwargs)
+            is_hit = getattr(response, 'from_cache', False)
+            self.stats['http_hits' if is_hit else 'http_misses'] += 1
+            return response
+
+        session.send = tracked_send
+        session._tracked = True
+
+    def _get_season_dirs(self) -> list[str]:
+        return [
+            entry.path
+            for entry in os.scandir(self.cache_dir)
+            if entry.is_dir() and entry.name.isdigit()
+        ]
+
+    @staticmethod
+    def _get_last_used(path: str) -> float:
+        last_used = os.stat(path).st_mtime
+        for root, _, files in os.walk(path):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                last_used = max(last_used, stat.st_atime, stat.st_mtime)
+        return last_used
+
+    @staticmethod
+    def _get_size(path: str) -> int:
+        size = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                size += os.path.getsize(os.path.join(root, name))
+        return size
+
+
+fastf1_cache = FastF1Cache(config.FASTF1_CACHE_DIR, config.FASTF1_CACHE_MAX_SIZE)
+
+
+async def get_latest_session(client) -> Optional[fastf1.core.Session]:
     event = await get_current_event(client)
     if event is None:
         return
@@ -24,13 +312,12 @@ async def get_latest_session(client) -> Optional[Session]:
 
 
 async def get_current_event(client) -> Optional[Event]:
-    def get_schedule():
-        return fastf1.get_event_schedule(now.year)
-
     now = datetime.datetime.now()
     monday = now - datetime.timedelta(days=now.weekday())
     sunday = monday + datetime.timedelta(days=6)
-    events = await client.loop.run_in_executor(None, get_schedule)
+    if not fastf1_cache.enabled:
+        await run_io(fastf1_cache.enable)
+    events = await run_io(fastf1.get_event_schedule, now.year)
     events = events.loc[(events['EventDate'] >= monday) & (events['EventDate'] <= sunday)]
 
     num_events = events.shape[0]
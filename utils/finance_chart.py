@@ -1,8 +1,20 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
 from io import BytesIO
+from typing import Optional, Type
+
+import config
+from utils.caching import SizedTTLCache
+from utils.executors import executors
+from utils.lazy import lazy_import
 
-import plotly.graph_objects as go
-from plotly.graph_objs.layout import Margin
-from yfinance import Ticker
+go = lazy_import('plotly.graph_objects')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+plotly_io = lazy_import('plotly.io')
+yfinance = lazy_import('yfinance')
 
 PERIOD_INTERVALS = {
     '1d': '5m',
@@ -18,37 +30,83 @@ PERIOD_INTERVALS = {
     'max': '1wk',
 }
 
+# Seconds that the data and charts are cached for, by interval
+INTERVAL_TTLS = {
+    '5m': 60,
+    '15m': 3 * 60,
+    '90m': 15 * 60,
+    '1h': 10 * 60,
+    '1d': 60 * 60,
+    '5d': 6 * 60 * 60,
+    '1wk': 24 * 60 * 60,
+}
+
+data_cache = SizedTTLCache('finance_chart.data', max_size=64 * 1024 * 1024)
+image_cache = SizedTTLCache('finance_chart.images', max_size=32 * 1024 * 1024)
+
+# Colors of the plotly_dark template and of Plotly's candlesticks
+BACKGROUND_COLOR = '#111111'
+GRID_COLOR = '#283442'
+TEXT_COLOR = '#f2f5fa'
+LINE_COLOR = '#636efa'
+INCREASING_COLOR = '#3d9970'
+DECREASING_COLOR = '#ff4136'
+
+WIDTH = 800
+HEIGHT = 500
+SCALE = 2
+
+
+@dataclass
+class ChartData:
+    symbol: str
+    name: Optional[str]
+    period: str
+    interval: str
+    data: pd.DataFrame
+
+    @property
+    def is_hourly(self) -> bool:
+        return self.interval[-1] in ['h', 'm']
+
 
 class BaseFinanceChart:
-    def __init__(self, ticker, period):
-        self.ticker = Ticker(ticker)
-        self.period = period
-        self.interval = PERIOD_INTERVALS.get(period, '1h')
-        self.is_hourly = self.interval[-1] in ['h', 'm']
-        self.ticker_data = self.ticker.history(period, self.interval)
-        self.ticker_info = self.ticker.info
+    def __init__(self, chart_data: ChartData):
+        self.chart_data = chart_data
+        self.period = chart_data.period
+        self.interval = chart_data.interval
+        self.is_hourly = chart_data.is_hourly
+        self.ticker_data = chart_data.data
 
     @property
-    def has_data(self):
-        has_symbol = 'symbol' in self.ticker_info
-        has_data = not self.ticker_data.empty
-        return has_symbol and has_data
-
-    async def to_image(self):
-        if not self.has_data:
-            return None
-        chart = await self.chart()
-        image_bytes = chart.to_image(format='png', scale=2)
-        image = BytesIO(image_bytes)
-        return image
-
-    async def chart(self):
+    def title_lines(self) -> tuple[str, str]:
+        return (
+            f'{self.chart_data.name} ({self.chart_data.symbol})',
+            f'Period: {self.period.upper()} | Interval: {self.interval.upper()}',
+        )
+
+    @property
+    def title(self) -> str:
+        title, subtitle = self.title_lines
+        return f'{title}<br><sup>{subtitle}</sup>'
+
+    def to_image(self, renderer: Optional[str] = None) -> bytes:
+        return get_renderer(renderer).render(self)
+
+    def chart(self) -> go.Figure:
+        """Build the Plotly figure of the chart."""
+        raise NotImplementedError()
+
+    def draw(self, ax, x: np.ndarray) -> None:
+        """
+        Draw the chart on the matplotlib axes. `x` are the positions of the
+        rows of the data.
+        """
         raise NotImplementedError()
 
 
 class FinanceLineChart(BaseFinanceChart):
-    async def chart(self):
-        info = self.ticker_info
+    def chart(self) -> go.Figure:
         data = self.ticker_data
 
         fig = go.Figure(
@@ -60,8 +118,7 @@ class FinanceLineChart(BaseFinanceChart):
             ],
             layout=go.Layout(
                 title=go.layout.Title(
-                    text=f"{info.get('longName', info.get('name'))} ({info['symbol']})<br>"
-                    f"<sup>Period: {self.period.upper()} | Interval: {self.interval.upper()}</sup>",
+                    text=self.title,
                     font=go.layout.title.Font(
                         family='Arial',
                         size=14,
@@ -69,7 +126,7 @@ class FinanceLineChart(BaseFinanceChart):
                 ),
                 width=800,
                 height=500,
-                margin=Margin(b=10, l=10, r=10, t=50),
+                margin=go.layout.Margin(b=10, l=10, r=10, t=50),
                 template='plotly_dark',
                 xaxis_rangebreaks=[
                     {'bounds': ["sat", "mon"]},
@@ -82,10 +139,14 @@ class FinanceLineChart(BaseFinanceChart):
 
         return fig
 
+    def draw(self, ax, x: np.ndarray) -> None:
+        y = self.ticker_data['High'].to_numpy(dtype=float)
+        valid = ~np.isnan(y)
+        ax.plot(x[valid], y[valid], color=LINE_COLOR, linewidth=1.5)
+
 
 class FinanceCandleChart(BaseFinanceChart):
-    async def chart(self):
-        info = self.ticker_info
+    def chart(self) -> go.Figure:
         data = self.ticker_data
 
         fig = go.Figure(
@@ -100,8 +161,7 @@ class FinanceCandleChart(BaseFinanceChart):
             ],
             layout=go.Layout(
                 title=go.layout.Title(
-                    text=f"{info.get('longName', info.get('name'))} ({info['symbol']})<br>"
-                    f"<sup>Period: {self.period.upper()} | Interval: {self.interval.upper()}</sup>",
+                    text=self.title,
                     font=go.layout.title.Font(
                         family='Arial',
                         size=14,
@@ -109,7 +169,7 @@ class FinanceCandleChart(BaseFinanceChart):
                 ),
                 width=800,
                 height=500,
-                margin=Margin(b=10, l=10, r=10, t=50),
+                margin=go.layout.Margin(b=10, l=10, r=10, t=50),
                 template='plotly_dark',
                 xaxis_rangebreaks=[
                     {'bounds': ["sat", "mon"]},
@@ -120,3 +180,219 @@ class FinanceCandleChart(BaseFinanceChart):
         )
 
         return fig
+
+    def draw(self, ax, x: np.ndarray) -> None:
+        from matplotlib.collections import PolyCollection
+
+        data = self.ticker_data
+        open_ = data['Open'].to_numpy(dtype=float)
+        high = data['High'].to_numpy(dtype=float)
+        low = data['Low'].to_numpy(dtype=float)
+        close = data['Close'].to_numpy(dtype=float)
+        colors = np.where(close >= open_, INCREASING_COLOR, DECREASING_COLOR)
+
+        # Doji candles still get a visible body
+        min_height = (np.nanmax(high) - np.nanmin(low)) / 500
+        top = np.where(np.abs(close - open_) < min_height, open_ + min_height, close)
+
+        # One collection for all the bodies, a patch per candle is several times slower
+        left, right = x - 0.3, x + 0.3
+        bodies = np.stack(
+            [
+                np.column_stack([left, open_]),
+                np.column_stack([left, top]),
+                np.column_stack([right, top]),
+                np.column_stack([right, open_]),
+            ],
+            axis=1,
+        )
+        ax.vlines(x, low, high, colors=colors, linewidth=0.8)
+        ax.add_collection(PolyCollection(bodies, facecolors=colors, linewidths=0))
+        ax.autoscale_view()
+
+
+class ChartRenderer:
+    name: str
+
+    def warm_up(self) -> None:
+        """Load what the renderer needs, so that the first chart isn't slower."""
+
+    def render(self, chart: BaseFinanceChart) -> bytes:
+        """Return the chart as a PNG."""
+        raise NotImplementedError()
+
+
+class PlotlyRenderer(ChartRenderer):
+    """
+    Renders the Plotly figures with Kaleido. Kaleido runs a headless Chromium
+    subprocess, which takes a few seconds to start and a few hundred MB.
+    """
+
+    name = 'plotly'
+
+    def warm_up(self) -> None:
+        plotly_io.to_image(go.Figure(), format='png')
+
+    def render(self, chart: BaseFinanceChart) -> bytes:
+        return chart.chart().to_image(format='png', width=WIDTH, height=HEIGHT, scale=SCALE)
+
+
+class MatplotlibRenderer(ChartRenderer):
+    """
+    Draws the charts from the NumPy arrays with matplotlib's Agg backend, in
+    process. It mimics the plotly_dark layout of the Plotly charts.
+
+    The rows are drawn at consecutive positions, labelled with their dates,
+    so the closed market hours and weekends don't take any space, like
+    Plotly's range breaks.
+    """
+
+    name = 'matplotlib'
+    dpi = 100 * SCALE
+
+    def warm_up(self) -> None:
+        # Importing matplotlib and loading the fonts takes most of a second
+        self.figure().savefig(BytesIO(), format='png')
+
+    def render(self, chart: BaseFinanceChart) -> bytes:
+        from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+        index = chart.ticker_data.index
+        x = np.arange(len(index))
+        date_format = self.date_format(index, chart.is_hourly)
+
+        fig = self.figure()
+        ax = fig.add_axes((0.08, 0.07, 0.9, 0.81))
+        ax.set_facecolor(BACKGROUND_COLOR)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        ax.grid(color=GRID_COLOR, linewidth=1)
+        ax.set_axisbelow(True)
+        ax.tick_params(colors=TEXT_COLOR, labelsize=8, length=0, pad=6)
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=8, integer=True))
+        ax.xaxis.set_major_formatter(
+            FuncFormatter(
+                lambda position, _: (
+                    index[int(position)].strftime(date_format) if 0 <= position < len(index) else ''
+                )
+            )
+        )
+        ax.set_xlim(-0.5, len(index) - 0.5)
+
+        chart.draw(ax, x)
+
+        title, subtitle = chart.title_lines
+        fig.text(0.05, 0.955, title, color=TEXT_COLOR, fontsize=10, family='sans-serif')
+        fig.text(0.05, 0.925, subtitle, color=TEXT_COLOR, fontsize=7, family='sans-serif')
+
+        image = BytesIO()
+        fig.savefig(image, format='png', facecolor=BACKGROUND_COLOR)
+        return image.getvalue()
+
+    def figure(self):
+        # Not pyplot, its global state isn't needed and isn't thread-safe
+        from matplotlib.figure import Figure
+
+        return Figure(figsize=(WIDTH / 100, HEIGHT / 100), dpi=self.dpi, facecolor=BACKGROUND_COLOR)
+
+    @staticmethod
+    def date_format(index: pd.DatetimeIndex, is_hourly: bool) -> str:
+        if is_hourly:
+            return '%H:%M' if index[0].date() == index[-1].date() else '%b %d %H:%M'
+        if index[-1] - index[0] > pd.Timedelta(days=3 * 365):
+            return '%Y'
+        return '%b %d %Y'
+
+
+RENDERERS = {renderer.name: renderer for renderer in [PlotlyRenderer(), MatplotlibRenderer()]}
+
+
+def get_renderer(name: Optional[str] = None) -> ChartRenderer:
+    """Return the renderer with the name, or the configured one."""
+    return RENDERERS[name or config.FINANCE_CHART_RENDERER]
+
+
+# Names of the renderers warmed up in this process
+warmed_up_renderers = set()
+
+
+# Rendering runs in the long-lived `charts` worker process, which keeps the
+# renderer loaded, and Kaleido's Chromium subprocess running, between charts.
+# The renderer is warmed up by the first chart, so a failure only fails that
+# chart and the next one tries again.
+def render_chart(chart_class: Type[BaseFinanceChart], chart_data: ChartData) -> bytes:
+    renderer = get_renderer()
+    if renderer.name not in warmed_up_renderers:
+        renderer.warm_up()
+        warmed_up_renderers.add(renderer.name)
+    return chart_class(chart_data).to_image(renderer.name)
+
+
+def fetch_chart_data(ticker: str, period: str) -> Optional[ChartData]:
+    """Download the ticker's data for the period. Blocking."""
+    ticker = yfinance.Ticker(ticker)
+    interval = PERIOD_INTERVALS.get(period, '1h')
+    data = ticker.history(period, interval)
+    if data.empty:
+        return None
+    info = ticker.info
+    if 'symbol' not in info:
+        return None
+    return ChartData(
+        symbol=info['symbol'],
+        name=info.get('longName', info.get('name')),
+        period=period,
+        interval=interval,
+        data=data,
+    )
+
+
+in_flight: dict[tuple, asyncio.Task] = {}
+
+
+async def coalesce(key: tuple, coro_func, *args):
+    """Run `coro_func(*args)` once for all the concurrent calls with the same key."""
+    task = in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_func(*args))
+        in_flight[key] = task
+        task.add_done_callback(lambda _: in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def get_chart_data(ticker: str, period: str) -> Optional[ChartData]:
+    key = (ticker, period, PERIOD_INTERVALS.get(period, '1h'))
+    chart_data = data_cache.get(key)
+    if chart_data is None:
+        chart_data = await coalesce(key, _fetch_chart_data, key)
+    return chart_data
+
+
+async def get_chart_image(
+    chart_class: Type[BaseFinanceChart], ticker: str, period: str
+) -> Optional[bytes]:
+    """Return the PNG chart of the ticker for the period, or None if there's no data."""
+    key = (ticker, period, PERIOD_INTERVALS.get(period, '1h'), chart_class.__name__)
+    image = image_cache.get(key)
+    if image is None:
+        image = await coalesce(key, _render_chart_image, key, chart_class)
+    return image
+
+
+async def _fetch_chart_data(key: tuple) -> Optional[ChartData]:
+    ticker, period, interval = key
+    chart_data = await executors.run('io', fetch_chart_data, ticker, period)
+    if chart_data is not None:
+        size = int(chart_data.data.memory_usage(deep=True).sum())
+        data_cache.set(key, chart_data, INTERVAL_TTLS.get(interval, 60), size)
+    return chart_data
+
+
+async def _render_chart_image(key: tuple, chart_class: Type[BaseFinanceChart]) -> Optional[bytes]:
+    ticker, period, interval, _ = key
+    chart_data = await get_chart_data(ticker, period)
+    if chart_data is None:
+        return None
+    image = await executors.run('charts', render_chart, chart_class, chart_data)
+    image_cache.set(key, image, INTERVAL_TTLS.get(interval, 60), len(image))
+    return image
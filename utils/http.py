@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Upstream:
+    limit: int = 20
+    limit_per_host: int = 5
+    connect_timeout: float = 10
+    read_timeout: float = 30
+    keepalive_timeout: float = 30
+    dns_cache_ttl: int = 300
+    compress: bool = True
+
+
+UPSTREAMS = {
+    'default': Upstream(),
+    'battlemetrics': Upstream(limit=10, limit_per_host=5, read_timeout=15),
+    'discord': Upstream(limit=5, limit_per_host=2),
+    'github': Upstream(limit=5, limit_per_host=5),
+    'movies': Upstream(limit=10, limit_per_host=5),
+    'openai': Upstream(limit=10, limit_per_host=10, read_timeout=120),
+}
+
+
+@dataclass
+class UpstreamStats:
+    limit: int
+    requests: int = 0
+    errors: int = 0
+    total_time: float = 0
+    max_time: float = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    queued: int = 0
+    max_queued: int = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.requests if self.requests else 0
+
+    @property
+    def saturation(self) -> float:
+        return self.in_flight / self.limit if self.limit else 0
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_time': self.avg_time,
+            'max_time': self.max_time,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'saturation': self.saturation,
+        }
+
+
+class HttpSessions:
+    """
+    One `aiohttp.ClientSession` per upstream, each with its own connection
+    pool, limits and timeouts as configured in `UPSTREAMS`.
+
+    Request latency and connection pool usage are tracked per upstream.
+    """
+
+    def __init__(self, upstreams: dict[str, Upstream]):
+        self.upstreams = upstreams
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+        self.stats = {
+            name: UpstreamStats(limit=upstream.limit) for name, upstream in upstreams.items()
+        }
+
+    async def start(self) -> None:
+        for name in self.upstreams:
+            self.get_session(name)
+
+    async def close(self) -> None:
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+    def get_session(self, name: str = 'default') -> aiohttp.ClientSession:
+        session = self.sessions.get(name)
+        if session is None or session.closed:
+            session = self._create_session(name)
+            self.sessions[name] = session
+        return session
+
+    def get_stats(self) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def _create_session(self, name: str) -> aiohttp.ClientSession:
+        upstream = self.upstreams[name]
+        connector = aiohttp.TCPConnector(
+            limit=upstream.limit,
+            limit_per_host=upstream.limit_per_host,
+            keepalive_timeout=upstream.keepalive_timeout,
+            ttl_dns_cache=upstream.dns_cache_ttl,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=upstream.connect_timeout,
+            sock_read=upstream.read_timeout,
+        )
+        headers = {} if upstream.compress else {'Accept-Encoding': 'identity'}
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers=headers,
+            auto_decompress=upstream.compress,
+            trace_configs=[self._create_trace_config(self.stats[name])],
+        )
+
+    @staticmethod
+    def _create_trace_config(stats: UpstreamStats) -> aiohttp.TraceConfig:
+        # Sent for every redirect, while the end or the exception is only sent
+        # once per request, so only the first start is counted
+        async def on_request_start(session, context, params):
+            if hasattr(context, 'start'):
+                return
+            context.start = session.loop.time()
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+        async def on_request_end(session, context, params):
+            elapsed = session.loop.time() - context.start
+            stats.in_flight -= 1
+            stats.requests += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+
+        async def on_request_exception(session, context, params):
+            stats.in_flight -= 1
+            stats.errors += 1
+
+        async def on_connection_queued_start(session, context, params):
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+
+        async def on_connection_queued_end(session, context, params):
+            stats.queued -= 1
+
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        return trace_config
+
+
+sessions = HttpSessions(UPSTREAMS)
+
+
+def get_session(upstream: Optional[str] = None) -> aiohttp.ClientSession:
+    """Return the session for the upstream, or the default one."""
+    return sessions.get_session(upstream or 'default')
@@ -1,13 +1,42 @@
 from __future__ import annotations
 
-from aiohttp_requests import requests
-from imdb.parser.http.movieParser import DOMHTMLMovieParser
+import json
+
+from aioredis import Redis
+
+from utils import http
+from utils.executors import run_cpu
+from utils.lazy import lazy_import
+
+movie_parser = lazy_import('imdb.parser.http.movieParser')
+
+REDIS_RATING_KEY = 'imdb_movie_rating:{}'
+RATING_TTL = 24 * 3600  # 1 day
 
 
 async def get_movie_details(movie_id: str) -> dict:
-    res = await requests.session.get(f'https://www.imdb.com/title/{movie_id}/reference')
+    url = f'https://www.imdb.com/title/{movie_id}/reference'
+    res = await http.get_session('movies').get(url)
     res.raise_for_status()
     html = await res.text()
-    parser = DOMHTMLMovieParser()
+    # Parsing the page takes a while, don't block the event loop with it
+    return await run_cpu(parse_movie_details, html)
+
+
+def parse_movie_details(html: str) -> dict:
+    parser = movie_parser.DOMHTMLMovieParser()
     data = parser.parse(html)
     return data['data']
+
+
+async def get_movie_rating(redis: Redis, movie_id: str) -> dict:
+    """Return the movie's IMDb votes and rating, cached in redis for a day."""
+    key = REDIS_RATING_KEY.format(movie_id)
+    value = await redis.get(key)
+    if value:
+        return json.loads(value.decode())
+
+    data = await get_movie_details(movie_id)
+    rating = {'votes': data.get('votes', 0), 'rating': data.get('rating')}
+    await redis.set(key, json.dumps(rating), ex=RATING_TTL)
+    return rating
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Lazy modules by name, in the order they were declared
+LAZY_MODULES: dict[str, LazyModule] = {}
+
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for a module that is only imported when one of its attributes
+    is first used, or when it's preloaded. Use `lazy_import` to create them.
+
+    How long the import took is kept in `load_time`, the modules it
+    imported as a side effect are counted in `loaded_modules`.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+        self._lock = threading.Lock()
+        self.load_time = None
+        self.loaded_modules = 0
+
+    def load(self) -> ModuleType:
+        if self._module is not None:
+            return self._module
+        # The import lock of the module is reentrant, this lock makes sure the
+        # timings are only recorded once
+        with self._lock:
+            if self._module is None:
+                modules = len(sys.modules)
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                self.load_time = time.perf_counter() - start
+                self.loaded_modules = len(sys.modules) - modules
+                self._module = module
+                logger.debug('Loaded %s in %.3fs', self.__name__, self.load_time)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f'<lazy module {self.__name__!r} ({state})>'
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a stand-in for the module `name` that imports it on first use.
+
+    The same stand-in is returned for every call with the same name, and
+    `preload` imports all of them.
+    """
+    module = LAZY_MODULES.get(name)
+    if module is None:
+        module = LazyModule(name)
+        LAZY_MODULES[name] = module
+    return module
+
+
+def preload() -> None:
+    """
+    Import all the lazy modules that aren't loaded yet. Blocking, the bot
+    runs it in the I/O pool once it's ready.
+    """
+    for module in list(LAZY_MODULES.values()):
+        try:
+            module.load()
+        except Exception:
+            logger.exception('Error preloading %s', module.__name__)
+
+
+def get_stats() -> dict[str, dict]:
+    return {
+        name: {
+            'loaded': module.is_loaded,
+            'load_time': module.load_time,
+            'modules': module.loaded_modules,
+        }
+        for name, module in LAZY_MODULES.items()
+    }
+
+
+def lazy_exports(package: str, exports: dict[str, str]):
+    """
+    Return the `__getattr__` and `__dir__` functions of a package that
+    imports its submodules when one of their `exports` is first used.
+
+    `exports` maps the exported names to the relative name of their module.
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(exports[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 import base64
+import functools
 import logging
 from io import BytesIO
 from typing import Optional
 
-import openai
-from aiohttp_requests import requests
 from tenacity import (
     retry,
     retry_if_not_exception_type,
@@ -15,12 +14,18 @@ from tenacity import (
     wait_fixed,
 )
 
-from utils import env
+from utils import env, http
+from utils.lazy import lazy_import
 
 BASE_URL = 'https://api.openai.com/v1'
 
 logger = logging.getLogger(__name__)
-client = openai.AsyncClient()
+openai = lazy_import('openai')
+
+
+@functools.cache
+def get_client() -> openai.AsyncClient:
+    return openai.AsyncClient()
 
 
 class ModerationFlaggedError(Exception):
@@ -137,7 +142,9 @@ async def _send_request(endpoint, method='GET', token=None, params=None, json_=N
 
     logger.debug('Sending request %s %s | JSON: %s | Headers: %s', method, url, json_, headers)
 
-    res = await requests.session.request(method, url, params=params, json=json_, headers=headers)
+    res = await http.get_session('openai').request(
+        method, url, params=params, json=json_, headers=headers
+    )
     data = await res.json()
     res.raise_for_status()
     return res
@@ -145,7 +152,7 @@ async def _send_request(endpoint, method='GET', token=None, params=None, json_=N
 
 async def describe_image(image_url: str) -> str:
     logger.info('Describing image %s', image_url)
-    response = await client.chat.completions.create(
+    response = await get_client().chat.completions.create(
         model='gpt-4-vision-preview',
         messages=[
             {
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Optional
+
+from aioredis import Redis
+
+from utils.battlemetrics import ServerSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Closed sessions, trimmed to about MAX_SESSIONS entries
+SESSIONS_KEY = 'bm_sessions'
+MAX_SESSIONS = 100_000
+# Sessions of the players that are online, by player
+OPEN_SESSIONS_KEY = 'bm_open_sessions'
+LAST_POLL_KEY = 'bm_sessions_last_poll'
+# Rollups of the seconds played, one hash per UTC day and one for all time
+ROLLUP_KEY = 'bm_stats:{}'
+ROLLUP_ALL = 'all'
+ROLLUP_TTL = 400 * 24 * 3600
+# Polls further apart than this close the open sessions instead of extending them
+MAX_POLL_GAP = 120
+
+
+@dataclass
+class Session:
+    player: str
+    server_id: str
+    server_name: str
+    layer: str
+    start: float
+    end: float
+
+
+@dataclass
+class Rollup:
+    """Seconds played by player, by player and layer, and by pair of players."""
+
+    playtime: Counter = field(default_factory=Counter)
+    layers: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+    coplay: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+
+    def add(self, values: dict[bytes, bytes]) -> None:
+        for key, value in values.items():
+            kind, player, *rest = json.loads(key)
+            seconds = float(value)
+            if kind == 'p':
+                self.playtime[player] += seconds
+            elif kind == 'l':
+                self.layers[player][rest[0]] += seconds
+            elif kind == 'c':
+                self.coplay[player][rest[0]] += seconds
+
+
+class SessionRecorder:
+    """
+    Record the sessions of the tracked players from the polls of their
+    servers.
+
+    A session is the time a player spends on a server and layer, from the
+    first poll they're seen on it to the last one, so a layer change starts
+    a new session. Closed sessions are added to a Redis stream that is
+    trimmed to the latest `MAX_SESSIONS`.
+
+    The time between polls is also added to daily rollups, so that the
+    stats of a period only sum a hash per day: the playtime of each player
+    (`["p", player]`), their time on each layer (`["l", player, layer]`)
+    and on the same server as each other player (`["c", player, other]`).
+    The fields are JSON arrays, so that names can contain any character.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.sessions: Optional[dict[str, Session]] = None  # Loaded on the first poll
+        self.last_poll: Optional[float] = None
+
+    async def load(self) -> None:
+        last_poll = await self.redis.get(LAST_POLL_KEY)
+        sessions = await self.redis.hgetall(OPEN_SESSIONS_KEY)
+        self.last_poll = float(last_poll) if last_poll else None
+        self.sessions = {}
+        for value in sessions.values():
+            session = Session(**json.loads(value))
+            session.end = self.last_poll or session.start
+            self.sessions[session.player] = session
+        logger.info('Loaded %d open sessions', len(self.sessions))
+
+    async def record(self, servers: Iterable[ServerSnapshot], now: Optional[float] = None) -> None:
+        now = now or time.time()
+        if self.sessions is None:
+            await self.load()
+
+        rollup = Counter()
+        is_gap = self.last_poll is None or now - self.last_poll > MAX_POLL_GAP
+        if not is_gap:
+            elapsed = now - self.last_poll
+            for session in self.sessions.values():
+                rollup[rollup_field('p', session.player)] += elapsed
+                rollup[rollup_field('l', session.player, session.layer)] += elapsed
+                for other in self.sessions.values():
+                    if other.player != session.player and other.server_id == session.server_id:
+                        rollup[rollup_field('c', session.player, other.player)] += elapsed
+                session.end = now
+
+        current = {player: server for server in servers for player in server.pepegas}
+        closed = []
+        for player, session in list(self.sessions.items()):
+            server = current.get(player)
+            is_same = server and (server.id, server.layer) == (session.server_id, session.layer)
+            if is_gap or not is_same:
+                closed.append(self.sessions.pop(player))
+        opened = []
+        for player, server in current.items():
+            if player not in self.sessions:
+                session = Session(player, server.id, server.name, server.layer, now, now)
+                self.sessions[player] = session
+                opened.append(session)
+
+        await self.save(now, rollup, opened, closed)
+        self.last_poll = now
+
+    async def save(
+        self, now: float, rollup: Counter, opened: list[Session], closed: list[Session]
+    ) -> None:
+        day = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date().isoformat()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for key, seconds in rollup.items():
+                pipe.hincrbyfloat(ROLLUP_KEY.format(day), key, round(seconds, 3))
+                pipe.hincrbyfloat(ROLLUP_KEY.format(ROLLUP_ALL), key, round(seconds, 3))
+            if rollup:
+                pipe.expire(ROLLUP_KEY.format(day), ROLLUP_TTL)
+            for session in closed:
+                pipe.hdel(OPEN_SESSIONS_KEY, session.player)
+                if session.end > session.start:
+                    pipe.xadd(
+                        SESSIONS_KEY,
+                        {key: str(value) for key, value in asdict(session).items()},
+                        maxlen=MAX_SESSIONS,
+                        approximate=True,
+                    )
+            for session in opened:
+                pipe.hset(OPEN_SESSIONS_KEY, session.player, json.dumps(asdict(session)))
+            pipe.set(LAST_POLL_KEY, now)
+            await pipe.execute()
+
+
+def rollup_field(*parts: str) -> str:
+    return json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+
+
+async def get_rollup(redis: Redis, days: Optional[int] = None) -> Rollup:
+    """Return the rollup of the last `days` UTC days, today included, or of all time."""
+    if days is None:
+        keys = [ROLLUP_KEY.format(ROLLUP_ALL)]
+    else:
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        keys = [
+            ROLLUP_KEY.format((today - datetime.timedelta(days=idx)).isoformat())
+            for idx in range(days)
+        ]
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        results = await pipe.execute()
+
+    rollup = Rollup()
+    for values in results:
+        rollup.add(values)
+    return rollup
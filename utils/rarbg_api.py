@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 from typing import Union
 
-from aiohttp_requests import requests
+from utils import http
 
 API_URL = 'http://torrentapi.org/pubapi_v2.php'
 
@@ -29,7 +29,7 @@ async def _send_request(params: dict[str, str]) -> dict:
 
     logger.debug('Sending request %s', params)
 
-    res = await requests.session.request('GET', API_URL, params=params)
+    res = await http.get_session('movies').request('GET', API_URL, params=params)
     res.raise_for_status()
     data = await res.json()
     return data
@@ -2,6 +2,39 @@ import json
 
 import aioredis
 from aioredis import Redis
+from aioredis.exceptions import ResponseError
+
+# Adds the given ids (ARGV[2:]) to the seen set in KEYS[1], a sorted set
+# scored by insertion order and bounded to ARGV[1] ids, and returns the ids
+# that weren't in it. Seen lists stored as a JSON string are migrated first.
+SEEN_SET_SCRIPT = """
+local key = KEYS[1]
+local max_length = tonumber(ARGV[1])
+
+if redis.call('TYPE', key)['ok'] == 'string' then
+    local old_ids = cjson.decode(redis.call('GET', key))
+    redis.call('DEL', key)
+    for idx, id in ipairs(old_ids) do
+        redis.call('ZADD', key, idx, tostring(id))
+    end
+end
+
+local last = redis.call('ZRANGE', key, -1, -1, 'WITHSCORES')
+local score = last[2] and tonumber(last[2]) or 0
+
+local unseen = {}
+for idx = 2, #ARGV do
+    local id = ARGV[idx]
+    if not redis.call('ZSCORE', key, id) then
+        score = score + 1
+        redis.call('ZADD', key, score, id)
+        table.insert(unseen, id)
+    end
+end
+
+redis.call('ZREMRANGEBYRANK', key, 0, -max_length - 1)
+return unseen
+"""
 
 
 def get_client() -> Redis:
@@ -9,13 +42,45 @@ def get_client() -> Redis:
     return client
 
 
-async def get_fifo_list(redis: Redis, key: str) -> list:
-    value = await redis.get(key)
-    if not value:
+async def filter_set_members(redis: Redis, key: str, values: list) -> list:
+    """Return the values that aren't in the set, in a single round trip."""
+    if not values:
         return []
-    return json.loads(value.decode())
+    async with redis.pipeline(transaction=False) as pipe:
+        for value in values:
+            pipe.sismember(key, value)
+        is_member = await pipe.execute()
+    return [value for value, member in zip(values, is_member) if not member]
 
 
-async def set_fifo_list(redis: Redis, key: str, list_: list, max_length: int) -> None:
-    value = json.dumps(list_[-max_length:])
-    await redis.set(key, value)
+async def add_set_members(redis: Redis, key: str, values: list) -> None:
+    if values:
+        await redis.sadd(key, *values)
+
+
+async def get_seen_set(redis: Redis, key: str) -> set[str]:
+    """Return the ids in the seen set, as strings."""
+    try:
+        values = await redis.zrange(key, 0, -1)
+    except ResponseError:
+        # Seen list stored as a JSON string, it's migrated on the next update
+        value = await redis.get(key)
+        return {str(id_) for id_ in json.loads(value.decode())} if value else set()
+    return {value.decode() for value in values}
+
+
+async def add_to_seen_set(redis: Redis, key: str, ids: list, max_length: int) -> list:
+    """
+    Add the ids to the seen set, keeping only the latest `max_length` ids, and
+    return the ones that hadn't been seen before.
+    """
+    if not ids:
+        return []
+    values = await redis.eval(SEEN_SET_SCRIPT, 1, key, max_length, *ids)
+    unseen = {value.decode() for value in values}
+    unseen_ids = []
+    for id_ in ids:
+        if str(id_) in unseen:
+            unseen.remove(str(id_))
+            unseen_ids.append(id_)
+    return unseen_ids
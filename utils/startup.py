@@ -0,0 +1,110 @@
+"""
+Startup timings of the bot, to track the time to ready and the baseline
+memory across releases.
+
+The bot marks each phase of the startup with `mark`. Times are from when
+this module was first imported, which `bot.py` does before anything else.
+Once the lazy modules are preloaded the report is logged, with the
+import time of each lazy module like `python -X importtime` would, and
+appended as a JSON line to `STARTUP_REPORT_FILE` if it's set.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+START = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Phase:
+    name: str
+    time: float  # Seconds since startup
+    rss: int  # Bytes
+    modules: int
+
+
+phases: list[Phase] = []
+
+
+def get_rss() -> int:
+    """Return the current RSS of the process in bytes, or the peak RSS if unknown."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def mark(name: str) -> Phase:
+    phase = Phase(name, time.perf_counter() - START, get_rss(), len(sys.modules))
+    phases.append(phase)
+    logger.info(
+        'Startup: %s after %.2fs, RSS %.0fMB, %s modules',
+        phase.name,
+        phase.time,
+        phase.rss / 1024 / 1024,
+        phase.modules,
+    )
+    return phase
+
+
+def get_release() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def report(report_file: Optional[str] = None) -> dict:
+    """
+    Log the startup phases and the import time of the lazy modules, and
+    append them to `report_file`. Blocking.
+    """
+    from utils import lazy
+
+    imports = sorted(
+        ((name, stats) for name, stats in lazy.get_stats().items() if stats['loaded']),
+        key=lambda item: item[1]['load_time'],
+        reverse=True,
+    )
+    lines = [f'{"phase":<16}{"time":>8}{"RSS":>9}{"modules":>9}']
+    lines += [
+        f'{phase.name:<16}{phase.time:>7.2f}s{phase.rss / 1024 / 1024:>7.0f}MB{phase.modules:>9}'
+        for phase in phases
+    ]
+    lines += ['', f'{"lazy import":<24}{"time":>8}{"modules":>9}']
+    lines += [
+        f'{name:<24}{stats["load_time"]:>7.2f}s{stats["modules"]:>9}' for name, stats in imports
+    ]
+    logger.info('Startup report:\n%s', '\n'.join(lines))
+
+    data = {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'release': get_release(),
+        'python': sys.version.split()[0],
+        'phases': [asdict(phase) for phase in phases],
+        'imports': {name: stats['load_time'] for name, stats in imports},
+    }
+    if report_file:
+        with open(report_file, 'a') as f:
+            f.write(json.dumps(data) + '\n')
+    return data
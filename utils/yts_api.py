@@ -1,38 +1,58 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
+from typing import Optional
 
-from aiohttp_requests import requests
+from utils import http
 
 API_URL = 'https://yts.mx/api/v2/list_movies.json'
+PAGE_LIMIT = 50
+PAGE_CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
 
-async def list_all_movies(query: str, quality: str = '2160p') -> list[dict]:
-    all_movies = []
+async def list_all_movies(
+    query: str, quality: str = '2160p', max_results: Optional[int] = None
+) -> list[dict]:
     params = {
-        'limit': 50,
+        'limit': PAGE_LIMIT,
         'quality': quality,
         'minimum_rating': 6,
         'query_term': query,
         'sort_by': 'like_count',
         'page': 1,
     }
-    while True:
-        data = await request(params)
-        movies = data['data'].get('movies')
-        if not movies:
-            break
-        all_movies.extend(movies)
-        params['page'] += 1
 
+    # The first page tells how many movies there are, the rest of the pages
+    # are requested concurrently
+    data = await request(params)
+    all_movies = data['data'].get('movies') or []
+    movie_count = data['data'].get('movie_count', 0)
+    if max_results is not None:
+        movie_count = min(movie_count, max_results)
+    num_pages = math.ceil(movie_count / PAGE_LIMIT)
+
+    semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+    async def request_page(page: int) -> dict:
+        async with semaphore:
+            return await request({**params, 'page': page})
+
+    pages = await asyncio.gather(*(request_page(page) for page in range(2, num_pages + 1)))
+    for page_data in pages:
+        all_movies.extend(page_data['data'].get('movies') or [])
+
+    if max_results is not None:
+        all_movies = all_movies[:max_results]
     return all_movies
 
 
 async def request(params: dict[str, str]) -> dict:
     logger.debug('Sending request %s', params)
-    res = await requests.session.request('GET', API_URL, params=params)
+    res = await http.get_session('movies').request('GET', API_URL, params=params)
     res.raise_for_status()
     data = await res.json()
     return data